@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+import time
+
+from engine import BOARD_SIZE, TT_SIZE_MB, WINNING_LENGTH, Cell, GomokuAI
+from geometry import get_geometry
+
+PIECES = {".": Cell.EMPTY, "-": Cell.EMPTY, "X": Cell.BLACK, "O": Cell.WHITE}
+SIDES = {"x": Cell.BLACK, "black": Cell.BLACK, "o": Cell.WHITE, "white": Cell.WHITE}
+
+
+def parse_position(line, size):
+    # "<board> [side]": the board is size * size cells of . X O, optionally
+    # split into rows by "/". White moves first, so without a side the
+    # player to move follows from the stone counts.
+    fields = line.split()
+    if not fields or len(fields) > 2:
+        raise ValueError("expected a board and an optional side to move")
+    cells = fields[0].replace("/", "").upper()
+    if len(cells) != size * size:
+        raise ValueError(f"board has {len(cells)} cells, expected {size * size}")
+    try:
+        board = [PIECES[ch] for ch in cells]
+    except KeyError as e:
+        raise ValueError(f"unknown cell {e.args[0]!r}")
+    
+    if len(fields) == 2:
+        if fields[1].lower() not in SIDES:
+            raise ValueError(f"unknown side {fields[1]!r}")
+        player = SIDES[fields[1].lower()]
+    else:
+        player = Cell.WHITE if board.count(Cell.WHITE) == board.count(Cell.BLACK) else Cell.BLACK
+    if Cell.EMPTY not in board:
+        raise ValueError("board is full")
+    return board, player
+
+
+def analyze(lines, ai, time_limit, node_limit, max_depth, out):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        result = {"line": number}
+        try:
+            board, player = parse_position(line, ai.size)
+        except ValueError as e:
+            result["error"] = str(e)
+        else:
+            started = time.perf_counter()
+            move = ai.get_best_move(board, player, time_limit, node_limit, max_depth)
+            result.update({
+                "move": list(move),
+                "score": ai.last_score,
+                "source": ai.last_source,
+                "nodes": ai.nodes,
+                "seconds": round(time.perf_counter() - started, 4),
+            })
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Print the engine's best move for each position read from a file or stdin.",
+        epilog="Each input line is a board of . X O cells, optionally split into rows by /, "
+               "followed by an optional side to move (x or o). X is black, O is white.")
+    parser.add_argument("path", nargs="?", default="-", help="positions file, - for stdin")
+    parser.add_argument("--time", type=float, default=1.0, help="search budget per position in seconds")
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--size", type=int, default=BOARD_SIZE)
+    parser.add_argument("--win-length", type=int, default=WINNING_LENGTH)
+    parser.add_argument("--tt-mb", type=float, default=TT_SIZE_MB,
+                        help="transposition table size; small tables start faster")
+    args = parser.parse_args()
+    
+    ai = GomokuAI(workers=1, geometry=get_geometry(args.size, args.win_length), tt_size_mb=args.tt_mb)
+    try:
+        if args.path == "-":
+            analyze(sys.stdin, ai, args.time, args.nodes, args.depth, sys.stdout)
+        else:
+            with open(args.path) as f:
+                analyze(f, ai, args.time, args.nodes, args.depth, sys.stdout)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        ai.shutdown()
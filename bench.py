@@ -0,0 +1,192 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from engine import BOARD_SIZE, Cell, GomokuAI
+
+PIECES = {".": Cell.EMPTY, "X": Cell.BLACK, "O": Cell.WHITE}
+
+# Fixed positions, one string per row; the engine plays the given side.
+CORPUS = {
+    "opening": (Cell.BLACK, [
+        "..........",
+        "..........",
+        "..........",
+        "..........",
+        "..........",
+        ".....O....",
+        "..........",
+        "..........",
+        "..........",
+        "..........",
+    ]),
+    "middlegame": (Cell.WHITE, [
+        "..........",
+        "..........",
+        ".....X....",
+        "...X...O..",
+        "....X.O...",
+        "..O..O....",
+        "....X.O...",
+        ".......X..",
+        "..........",
+        "..........",
+    ]),
+    "tactical": (Cell.BLACK, [
+        "..........",
+        "..........",
+        "..........",
+        "......X...",
+        "....X.O...",
+        "...OOO....",
+        "...X.X....",
+        ".......O..",
+        "..........",
+        "..........",
+    ]),
+    "endgame": (Cell.WHITE, [
+        "XOXOXOXOXO",
+        "XOXOXOXOXO",
+        "OXOXOXOXOX",
+        "OXO...OXOX",
+        "XOX...XOXO",
+        "XOX...XOXO",
+        "OXO...OXOX",
+        "OXOXOXOXOX",
+        "XOXOXOXOXO",
+        "XOXOXOXOXO",
+    ]),
+}
+
+# +1 when a higher value is better, -1 when lower is better.
+METRICS = {
+    "nodes": -1,
+    "nodes_per_sec": 1,
+    "tt_hit_rate": 1,
+    "seconds": -1,
+    "peak_kb": -1,
+}
+
+
+def parse_board(rows):
+    board = [PIECES[ch] for row in rows for ch in row]
+    if len(board) != BOARD_SIZE * BOARD_SIZE:
+        raise ValueError(f"corpus boards must be {BOARD_SIZE}x{BOARD_SIZE}")
+    return board
+
+
+def search(ai, board, player, depth):
+    started = time.perf_counter()
+    move = ai.get_best_move(board[:], player, max_depth=depth)
+    return move, time.perf_counter() - started
+
+
+def bench_position(ai, board, player, depth, repeat):
+    # Each depth is searched from a cleared table and the fastest of the
+    # repeats is kept, which filters out most scheduler noise. The first
+    # search only warms the engine's lazily built tables.
+    search(ai, board, player, 1)
+    time_to_depth = {}
+    for d in range(1, depth + 1):
+        elapsed = float('inf')
+        for _ in range(repeat):
+            ai.reset()
+            move, seconds = search(ai, board, player, d)
+            elapsed = min(elapsed, seconds)
+        time_to_depth[d] = round(elapsed, 4)
+    
+    table = ai.transposition_table
+    nodes = ai.nodes
+    result = {
+        "move": list(move),
+        "score": ai.last_score,
+        "nodes": nodes,
+        "threat_nodes": ai.threat_solver.nodes,
+        "seconds": round(elapsed, 4),
+        "nodes_per_sec": round(nodes / elapsed) if elapsed > 0 else 0,
+        "time_to_depth": time_to_depth,
+        "tt_probes": table.probes,
+        "tt_hit_rate": round(table.hits / table.probes, 4) if table.probes else 0.0,
+    }
+    
+    # The table is preallocated, so the peak covers what the search itself
+    # allocates; it runs separately so tracing does not skew the timings.
+    ai.reset()
+    tracemalloc.start()
+    try:
+        search(ai, board, player, depth)
+        result["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def run(depth, repeat=3, names=None):
+    ai = GomokuAI()
+    ai.opening_book = None
+    # Warm results from earlier runs would hide changes in search speed.
+    if ai.position_cache is not None:
+        ai.position_cache.close()
+        ai.position_cache = None
+    results = {}
+    for name, (player, rows) in CORPUS.items():
+        if names and name not in names:
+            continue
+        results[name] = bench_position(ai, parse_board(rows), player, depth, repeat)
+    ai.shutdown()
+    return {"depth": depth, "positions": results}
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    if baseline.get("depth") != report["depth"]:
+        regressions.append(f"baseline was run at depth {baseline.get('depth')}, "
+                           f"not {report['depth']}")
+        return regressions
+    
+    for name, result in report["positions"].items():
+        base = baseline["positions"].get(name)
+        if base is None:
+            continue
+        for metric, direction in METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction < -tolerance:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Gomoku engine on a fixed corpus.")
+    parser.add_argument("--depth", type=int, default=4,
+                        help="iterative deepening depth to search each position to")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="searches per depth, the fastest one is reported")
+    parser.add_argument("--positions", nargs="*", choices=sorted(CORPUS),
+                        help="only run these corpus positions")
+    parser.add_argument("--save", metavar="PATH",
+                        help="write the report to PATH as the new baseline")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="compare against a saved report and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+    
+    report = run(args.depth, args.repeat, args.positions)
+    print(json.dumps(report, indent=2))
+    
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
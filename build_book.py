@@ -0,0 +1,77 @@
+import argparse
+import time
+
+from engine import BOARD_SIZE, BOOK_PATH, Cell, GomokuAI, OpeningBook
+
+
+def build_book(plies, width, time_limit, path):
+    ai = GomokuAI()
+    # Search from scratch rather than replaying an existing book.
+    ai.opening_book = None
+    book = OpeningBook(ai.geometry, path)
+    book.close()
+    entries = {}
+    
+    # White always moves first in this game, so the book covers white from
+    # the empty board and black against white's opening stones near the centre.
+    frontier = [([Cell.EMPTY] * (BOARD_SIZE * BOARD_SIZE), Cell.WHITE)]
+    center = BOARD_SIZE // 2
+    for r in range(center - 2, center + 3):
+        for c in range(center - 2, center + 3):
+            board = [Cell.EMPTY] * (BOARD_SIZE * BOARD_SIZE)
+            board[r * BOARD_SIZE + c] = Cell.WHITE
+            frontier.append((board, Cell.BLACK))
+    for ply in range(plies):
+        next_frontier = []
+        started = time.perf_counter()
+        
+        for board, player in frontier:
+            key, t = book.canonical(board, player)
+            if key in entries:
+                continue
+            
+            if not any(board):
+                center = BOARD_SIZE // 2
+                move, score = (center, center), 0
+            else:
+                ai.reset()
+                move = ai.get_best_move(board[:], player, time_limit=time_limit)
+                score = ai.last_score
+            if move[0] == -1:
+                continue
+            entries[key] = (book.maps[t][move[0] * BOARD_SIZE + move[1]], score)
+            
+            opponent = Cell.WHITE if player == Cell.BLACK else Cell.BLACK
+            child = board[:]
+            child[move[0] * BOARD_SIZE + move[1]] = player
+            if ai.check_win(child, player):
+                continue
+            
+            replies = ai.generate_candidate_moves(child)
+            ai.load_search_state(child)
+            ai.sort_moves_by_priority(replies, child, opponent)
+            for r, c in replies[:width]:
+                grandchild = child[:]
+                grandchild[r * BOARD_SIZE + c] = opponent
+                if not ai.check_win(grandchild, opponent):
+                    next_frontier.append((grandchild, player))
+        
+        print(f"ply {ply + 1}: {len(entries)} positions "
+              f"({time.perf_counter() - started:.1f}s)")
+        frontier = next_frontier
+    
+    book.write(path, entries)
+    print(f"wrote {len(entries)} positions to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Gomoku opening book.")
+    parser.add_argument("--plies", type=int, default=3,
+                        help="number of engine moves to cover from the empty board")
+    parser.add_argument("--width", type=int, default=4,
+                        help="opponent replies expanded after each book move")
+    parser.add_argument("--time", type=float, default=5.0,
+                        help="search time per book position in seconds")
+    parser.add_argument("--output", default=BOOK_PATH)
+    args = parser.parse_args()
+    build_book(args.plies, args.width, args.time, args.output)
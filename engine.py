@@ -0,0 +1,1827 @@
+import time
+import random
+import threading
+import itertools
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from concurrent.futures import FIRST_EXCEPTION, wait
+
+from geometry import get_geometry
+from patterns import BLOCKED, FIVE, FOUR, OPEN_THREE, OWN, pattern_table
+
+# numpy and multiprocessing are imported on first use; together they cost
+# more than the rest of the engine, and most callers need neither.
+np = None
+
+logger = logging.getLogger("gomoku")
+
+BOARD_SIZE = 10
+WINNING_LENGTH = 5
+AI_SEARCH_DEPTH = 5
+AI_TIME_LIMIT = None
+AI_NODE_LIMIT = None
+AI_WORKERS = 1
+AI_PONDER = True
+PONDER_REPLIES = 3
+THREAT_NODE_LIMIT = 3000
+# Share of the move's time or node budget the threat pre-pass may use.
+THREAT_BUDGET_SHARE = 0.2
+VCF_DEPTH = 8
+VCT_DEPTH = 4
+USE_SYMMETRIC_TT = True
+SYMMETRY_MAX_STONES = 12
+STATIC_ORDER_PLIES = 2
+# Moves that win, block a five, make or stop a four or make an open three
+# are always searched. The quiet moves after them are cut to BEAM_WIDTH at
+# the root, BEAM_PLY_STEP fewer per ply, and shrink toward BEAM_MIN_WIDTH
+# over the second half of the time budget.
+BEAM_WIDTH = 15
+BEAM_PLY_STEP = 3
+BEAM_MIN_WIDTH = 4
+ASPIRATION_WINDOW = 1000
+USE_OPENING_BOOK = True
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+TT_SIZE_MB = 16
+USE_POSITION_CACHE = False
+POSITION_CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+POSITION_CACHE_MB = 64
+POSITION_CACHE_MIN_DEPTH = 2
+USE_BITBOARD = True
+USE_BATCH_EVAL = False
+AI_SEARCH_STATS = False
+WIN_SCORE = 1000000
+PATTERN_CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Indexed by the threat class from patterns.py: none, one, two, open two,
+# three, open three, four, open four, five.
+THREAT_SCORES = (0, 10, 50, 200, 300, 2000, 2500, 20000, 50000)
+THREAT_LEVELS = (0, 0, 0, 0, 100, 500, 1000, 5000, 10000)
+
+
+class Cell:
+    EMPTY = 0
+    BLACK = 1
+    WHITE = 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def default_geometry():
+    return get_geometry(BOARD_SIZE, WINNING_LENGTH)
+
+
+class TTFlag:
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+
+class TranspositionTable:
+    # key (8) + score (4) + depth (1) + flag (1) + move (2) + age (1)
+    ENTRY_BYTES = 17
+    BUCKET_SIZE = 2
+    
+    def __init__(self, size_mb=None, geometry=None):
+        self.geometry = geometry or default_geometry()
+        if size_mb is None:
+            size_mb = TT_SIZE_MB
+        self.zobrist = self.geometry.zobrist
+        self.symmetry_maps = self.geometry.symmetry_maps
+        self.symmetry_inverses = self.geometry.symmetry_inverses
+        
+        entries = max(self.BUCKET_SIZE, int(size_mb * 1024 * 1024) // self.ENTRY_BYTES)
+        self.num_buckets = entries // self.BUCKET_SIZE
+        self.capacity = self.num_buckets * self.BUCKET_SIZE
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.allocate()
+    
+    def allocate(self):
+        n = self.capacity
+        self.keys = array('Q', [0]) * n
+        self.scores = array('i', [0]) * n
+        self.depths = array('b', [-1]) * n
+        self.flags = array('B', [TTFlag.EXACT]) * n
+        self.moves = array('h', [-1]) * n
+        self.ages = array('B', [0]) * n
+    
+    def compute_hash(self, board):
+        h = 0
+        for idx, piece in enumerate(board):
+            if piece != Cell.EMPTY:
+                r, c = divmod(idx, self.geometry.size)
+                h ^= self.zobrist[r][c][piece]
+        return h
+    
+    def update_hash(self, h, r, c, piece):
+        return h ^ self.zobrist[r][c][piece]
+    
+    def symmetric_piece_keys(self):
+        return self.geometry.symmetric_piece_keys()
+    
+    def compute_symmetric_hashes(self, board):
+        keys = self.symmetric_piece_keys()
+        hashes = [0] * len(self.symmetry_maps)
+        for idx, piece in enumerate(board):
+            if piece != Cell.EMPTY:
+                hashes = [h ^ k for h, k in zip(hashes, keys[idx][piece])]
+        return hashes
+    
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+    
+    def find_slot(self, hash_key):
+        slot = (hash_key % self.num_buckets) * self.BUCKET_SIZE
+        for i in range(slot, slot + self.BUCKET_SIZE):
+            if self.depths[i] >= 0 and self.keys[i] == hash_key:
+                return i
+        return -1
+    
+    def contains(self, hash_key):
+        return self.find_slot(hash_key) != -1
+    
+    def get(self, hash_key):
+        self.probes += 1
+        i = self.find_slot(hash_key)
+        if i == -1:
+            return None
+        self.hits += 1
+        return self.scores[i], self.depths[i], self.flags[i], self.moves[i]
+    
+    def set(self, hash_key, value, depth, flag=TTFlag.EXACT, best_move=-1):
+        slot = (hash_key % self.num_buckets) * self.BUCKET_SIZE
+        
+        # Slot 0 keeps the deepest result of the current search, slot 1 is
+        # always overwritten so fresh shallow results still get cached.
+        i = slot
+        if self.depths[i] >= 0 and self.ages[i] == self.age and self.depths[i] > depth:
+            i = slot + 1
+        
+        self.stores += 1
+        if self.depths[i] >= 0:
+            if self.keys[i] != hash_key:
+                self.overwrites += 1
+            elif best_move == -1:
+                best_move = self.moves[i]
+        
+        self.keys[i] = hash_key
+        self.scores[i] = int(value)
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.moves[i] = best_move
+        self.ages[i] = self.age
+    
+    def clear(self):
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.allocate()
+
+
+class BitBoard:
+    def __init__(self, geometry=None):
+        self.geometry = geometry or default_geometry()
+        self.size = self.geometry.size
+        self.win_length = self.geometry.win_length
+        # One padding column per row stops shifted runs wrapping onto the next row.
+        self.width = self.size + 1
+        self.shifts = (1, self.width, self.width + 1, self.width - 1)
+        self.full_mask = 0
+        for r in range(self.size):
+            for c in range(self.size):
+                self.full_mask |= self.bit(r, c)
+        self.stones = [0, 0, 0]
+    
+    def bit(self, r, c):
+        return 1 << (r * self.width + c)
+    
+    def load(self, board_state):
+        self.stones = [0, 0, 0]
+        for idx, piece in enumerate(board_state):
+            if piece != Cell.EMPTY:
+                self.stones[piece] |= self.bit(*divmod(idx, self.size))
+    
+    def place(self, r, c, player):
+        self.stones[player] |= self.bit(r, c)
+    
+    def remove(self, r, c, player):
+        self.stones[player] &= ~self.bit(r, c)
+    
+    def occupied(self):
+        return self.stones[Cell.BLACK] | self.stones[Cell.WHITE]
+    
+    def is_empty(self, r, c):
+        return not (self.occupied() >> (r * self.width + c)) & 1
+    
+    def is_full(self):
+        return self.occupied() == self.full_mask
+    
+    def has_line(self, stones):
+        for shift in self.shifts:
+            run = stones
+            for i in range(1, self.win_length):
+                run &= stones >> (i * shift)
+            if run:
+                return True
+        return False
+    
+    def has_five(self, player):
+        return self.has_line(self.stones[player])
+    
+    def would_win(self, r, c, player):
+        return self.has_line(self.stones[player] | self.bit(r, c))
+
+
+class ThreatSolver:
+    def __init__(self, bitboard):
+        self.bitboard = bitboard
+        self.win_length = bitboard.win_length
+        self.window_starts = []
+        for shift in bitboard.shifts:
+            starts = bitboard.full_mask
+            for j in range(1, self.win_length):
+                starts &= bitboard.full_mask >> (j * shift)
+            self.window_starts.append(starts)
+        
+        self.patterns = {}
+        for stones in range(self.win_length):
+            self.patterns[stones] = []
+            for combo in itertools.combinations(range(self.win_length), stones):
+                gaps = tuple(j for j in range(self.win_length) if j not in combo)
+                self.patterns[stones].append((combo, gaps))
+        
+        self.nodes = 0
+        self.node_limit = THREAT_NODE_LIMIT
+        self.deadline = None
+        self.exhausted = False
+        self.win_plies = 0
+    
+    def window_cells(self, player, stones):
+        # Empty cells of every five-cell window holding exactly `stones` of
+        # player's stones and no opposing stone.
+        own = self.bitboard.stones[player]
+        empty = self.bitboard.full_mask & ~self.bitboard.occupied()
+        cells = 0
+        for shift, starts in zip(self.bitboard.shifts, self.window_starts):
+            own_at = [own >> (j * shift) for j in range(self.win_length)]
+            empty_at = [empty >> (j * shift) for j in range(self.win_length)]
+            for combo, gaps in self.patterns[stones]:
+                windows = starts
+                for j in combo:
+                    windows &= own_at[j]
+                for j in gaps:
+                    windows &= empty_at[j]
+                if windows:
+                    for j in gaps:
+                        cells |= windows << (j * shift)
+        return cells
+    
+    def five_cells(self, player):
+        return self.window_cells(player, self.win_length - 1)
+    
+    def four_cells(self, player):
+        return self.window_cells(player, self.win_length - 2)
+    
+    def three_cells(self, player):
+        return self.window_cells(player, self.win_length - 3)
+    
+    def open_four_cells(self, player):
+        cells = 0
+        for pos in self.iter_bits(self.four_cells(player)):
+            self.bitboard.stones[player] |= 1 << pos
+            if self.five_cells(player).bit_count() >= 2:
+                cells |= 1 << pos
+            self.bitboard.stones[player] &= ~(1 << pos)
+        return cells
+    
+    def iter_bits(self, mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+    
+    def to_move(self, pos):
+        return divmod(pos, self.bitboard.width)
+    
+    def start(self, node_limit=None, deadline=None):
+        self.nodes = 0
+        self.node_limit = THREAT_NODE_LIMIT if node_limit is None else node_limit
+        self.deadline = deadline
+        self.exhausted = False
+    
+    def count_node(self):
+        self.nodes += 1
+        if (self.nodes > self.node_limit or self.deadline is not None and self.nodes % 16 == 0
+                and time.perf_counter() >= self.deadline):
+            self.exhausted = True
+            raise SearchTimeout()
+    
+    def winning_move(self, player):
+        fives = self.five_cells(player)
+        if not fives:
+            return None
+        return self.to_move((fives & -fives).bit_length() - 1)
+    
+    def solve(self, attacker):
+        defender = Cell.WHITE if attacker == Cell.BLACK else Cell.BLACK
+        for use_threes, max_depth in ((False, VCF_DEPTH), (True, VCT_DEPTH)):
+            for depth in range(1, max_depth + 1):
+                try:
+                    pos = self.attack(attacker, defender, depth, use_threes)
+                except SearchTimeout:
+                    return None
+                if pos is not None:
+                    # Each attacking move is answered, and the last threat
+                    # leaves two fives: the win lands within this many plies.
+                    self.win_plies = 2 * depth + 1
+                    return self.to_move(pos)
+        return None
+    
+    def attack(self, attacker, defender, depth, use_threes):
+        self.count_node()
+        fives = self.five_cells(attacker)
+        if fives:
+            return (fives & -fives).bit_length() - 1
+        
+        blocks = self.five_cells(defender)
+        if blocks:
+            if blocks & (blocks - 1):
+                return None
+            candidates = [blocks.bit_length() - 1]
+        else:
+            if depth <= 0:
+                return None
+            fours = self.four_cells(attacker)
+            candidates = list(self.iter_bits(fours))
+            if use_threes:
+                candidates.extend(self.iter_bits(self.three_cells(attacker) & ~fours))
+        
+        for pos in candidates:
+            self.bitboard.stones[attacker] |= 1 << pos
+            try:
+                won = self.defend(attacker, defender, depth - 1, use_threes)
+            finally:
+                self.bitboard.stones[attacker] &= ~(1 << pos)
+            if won:
+                return pos
+        return None
+    
+    def defend(self, attacker, defender, depth, use_threes):
+        self.count_node()
+        if self.five_cells(defender):
+            return False
+        
+        fives = self.five_cells(attacker)
+        if fives & (fives - 1):
+            return True
+        if fives:
+            replies = fives
+        else:
+            # An open three only forces a reply if the attacker could turn it
+            # into a double five threat; any cell outside the attacker's
+            # three-stone windows, other than a counter-four, leaves that intact.
+            if not use_threes or depth <= 0 or not self.open_four_cells(attacker):
+                return False
+            replies = self.four_cells(attacker) | self.four_cells(defender)
+        
+        for pos in self.iter_bits(replies):
+            self.bitboard.stones[defender] |= 1 << pos
+            try:
+                won = self.attack(attacker, defender, depth, use_threes) is not None
+            finally:
+                self.bitboard.stones[defender] &= ~(1 << pos)
+            if not won:
+                return False
+        return True
+    
+    def defences(self, attacker):
+        defender = Cell.WHITE if attacker == Cell.BLACK else Cell.BLACK
+        if self.solve(attacker) is None:
+            return None
+        
+        candidates = (self.four_cells(attacker) | self.three_cells(attacker) |
+                      self.four_cells(defender))
+        moves = []
+        for pos in self.iter_bits(candidates):
+            self.bitboard.stones[defender] |= 1 << pos
+            refuted = self.solve(attacker) is None
+            self.bitboard.stones[defender] &= ~(1 << pos)
+            if refuted:
+                moves.append(self.to_move(pos))
+        # Once the budget runs out every later solve comes back empty, which
+        # would pass off unchecked cells as refutations.
+        if self.exhausted:
+            return None
+        return moves
+
+
+class OpeningBook:
+    MAGIC = b"GMKB"
+    HEADER = struct.Struct("<4sHHI")
+    RECORD = struct.Struct("<QHi")
+    # Folded into the key so the same stones with a different side to move
+    # never share an entry.
+    SIDE_KEYS = (0, 0, 0x9E3779B97F4A7C15)
+    
+    def __init__(self, geometry=None, path=None):
+        self.geometry = geometry or default_geometry()
+        if path is None:
+            path = BOOK_PATH
+        self.size = self.geometry.size
+        self.zobrist = self.geometry.zobrist
+        self.path = path
+        self.mm = None
+        self.count = 0
+        
+        self.maps = self.geometry.symmetry_maps
+        self.inverse_maps = self.geometry.symmetry_inverses
+        
+        self.open()
+    
+    def open(self):
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return
+        
+        magic, version, size, count = self.HEADER.unpack_from(mm, 0)
+        if magic != self.MAGIC or version != 1 or size != self.size:
+            mm.close()
+            return
+        self.mm = mm
+        self.count = count
+    
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+            self.count = 0
+    
+    def canonical(self, board_state, player):
+        best_key = None
+        best_transform = 0
+        for t, mapping in enumerate(self.maps):
+            h = 0
+            for idx, piece in enumerate(board_state):
+                if piece != Cell.EMPTY:
+                    r, c = divmod(mapping[idx], self.size)
+                    h ^= self.zobrist[r][c][piece]
+            if best_key is None or h < best_key:
+                best_key = h
+                best_transform = t
+        return best_key ^ self.SIDE_KEYS[player], best_transform
+    
+    def find(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = self.HEADER.size + mid * self.RECORD.size
+            mid_key, move, score = self.RECORD.unpack_from(self.mm, offset)
+            if mid_key == key:
+                return move, score
+            if mid_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+    
+    def lookup(self, board_state, player):
+        # The book move and the score it was searched to, for player.
+        if self.mm is None:
+            return None
+        key, t = self.canonical(board_state, player)
+        entry = self.find(key)
+        if entry is None:
+            return None
+        idx = self.inverse_maps[t][entry[0]]
+        if board_state[idx] != Cell.EMPTY:
+            return None
+        return divmod(idx, self.size), entry[1]
+    
+    def write(self, path, entries):
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, 1, self.size, len(entries)))
+            for key in sorted(entries):
+                move, score = entries[key]
+                f.write(self.RECORD.pack(key, move, max(-2**31, min(2**31 - 1, int(score)))))
+
+
+class PositionCache:
+    MAGIC = b"GMKC"
+    HEADER = struct.Struct("<4sHHHHI")
+    # key, score, depth, flag, move, generation
+    RECORD = struct.Struct("<QiBBhH")
+    BUCKET_SIZE = 4
+    
+    def __init__(self, geometry=None, directory=None, size_mb=None):
+        self.geometry = geometry or default_geometry()
+        if directory is None:
+            directory = POSITION_CACHE_DIR
+        if size_mb is None:
+            size_mb = POSITION_CACHE_MB
+        self.path = os.path.join(directory, f"position_cache_{self.geometry.size}_"
+                                            f"{self.geometry.win_length}.bin")
+        records = max(self.BUCKET_SIZE, int(size_mb * 1024 * 1024) // self.RECORD.size)
+        self.num_buckets = records // self.BUCKET_SIZE
+        self.capacity = self.num_buckets * self.BUCKET_SIZE
+        self.mm = None
+        self.generation = 0
+        self.pending = {}
+        self.hits = 0
+        self.writes = 0
+        
+        self.open()
+    
+    def open(self):
+        size = self.HEADER.size + self.capacity * self.RECORD.size
+        try:
+            with open(self.path, "a+b") as f:
+                f.seek(0)
+                header = f.read(self.HEADER.size)
+                valid = False
+                generation = 0
+                if len(header) == self.HEADER.size and os.fstat(f.fileno()).st_size == size:
+                    magic, version, board, win, generation, capacity = self.HEADER.unpack(header)
+                    valid = (magic == self.MAGIC and version == 1 and board == self.geometry.size
+                             and win == self.geometry.win_length and capacity == self.capacity)
+                if not valid:
+                    # A file from another shape or size cap is started over.
+                    f.truncate(0)
+                    f.truncate(size)
+                    generation = 0
+                self.mm = mmap.mmap(f.fileno(), size)
+        except (OSError, ValueError):
+            self.mm = None
+            return
+        
+        # Every session is a new generation, so entries from long ago are
+        # the first to go when a bucket fills.
+        self.generation = (generation + 1) & 0xFFFF
+        self.HEADER.pack_into(self.mm, 0, self.MAGIC, 1, self.geometry.size,
+                              self.geometry.win_length, self.generation, self.capacity)
+    
+    def close(self):
+        if self.mm is not None:
+            self.flush()
+            self.mm.close()
+            self.mm = None
+    
+    def record_offset(self, i):
+        return self.HEADER.size + i * self.RECORD.size
+    
+    def get(self, key, player):
+        if self.mm is None:
+            return None
+        key ^= OpeningBook.SIDE_KEYS[player]
+        slot = (key % self.num_buckets) * self.BUCKET_SIZE
+        for i in range(slot, slot + self.BUCKET_SIZE):
+            rec_key, score, depth, flag, move, _ = self.RECORD.unpack_from(self.mm, self.record_offset(i))
+            if depth and rec_key == key:
+                self.hits += 1
+                return score, depth, flag, move
+        return None
+    
+    def record(self, key, player, value, depth, flag, best_move):
+        # Results are written back in batches by flush().
+        key ^= OpeningBook.SIDE_KEYS[player]
+        pending = self.pending.get(key)
+        if pending is None or pending[1] <= depth:
+            self.pending[key] = (int(value), depth, flag, best_move)
+    
+    def flush(self):
+        if self.mm is None or not self.pending:
+            self.pending = {}
+            return
+        for key, (value, depth, flag, best_move) in self.pending.items():
+            self.store(key, max(-2**31, min(2**31 - 1, value)), min(depth, 255), flag, best_move)
+        self.writes += len(self.pending)
+        self.pending = {}
+        self.mm.flush()
+    
+    def store(self, key, value, depth, flag, best_move):
+        slot = (key % self.num_buckets) * self.BUCKET_SIZE
+        victim = slot
+        victim_priority = None
+        for i in range(slot, slot + self.BUCKET_SIZE):
+            rec_key, _, rec_depth, _, _, rec_generation = self.RECORD.unpack_from(self.mm, self.record_offset(i))
+            if rec_depth == 0 or rec_key == key:
+                if rec_key == key and rec_depth > depth:
+                    return
+                victim = i
+                break
+            # Shallow entries go first, and each generation of age counts
+            # as one ply of depth lost.
+            age = (self.generation - rec_generation) & 0xFFFF
+            priority = rec_depth - age
+            if victim_priority is None or priority < victim_priority:
+                victim = i
+                victim_priority = priority
+        self.RECORD.pack_into(self.mm, self.record_offset(victim), key, value, depth, flag,
+                              best_move, self.generation)
+
+
+class IncrementalEvaluator:
+    # Every cell keeps a base-3 segment code per direction for each colour.
+    # A move rewrites the digit it covers in the nearby codes, and each empty
+    # cell scores THREAT_SCORES of its pattern class along every direction.
+    # Alongside the scores it counts, per colour, the empty-cell directions
+    # that make an open three or better and those that make five.
+    FIVE_COUNT = 1 << 16
+    
+    def __init__(self, geometry=None):
+        self.geometry = geometry or default_geometry()
+        self.patterns = pattern_table(self.geometry.win_length, PATTERN_CACHE_DIR)
+        self.members = self.geometry.segment_members
+        self.base = self.geometry.segment_base
+        self.slots_per_cell = len(self.geometry.DIRECTIONS)
+        self.values = None
+        self.value_source = None
+        # Both counts share one integer: threats in the low bits and fives
+        # from FIVE_COUNT up, which no board has enough directions to reach.
+        self.threat_counts = [(cls >= OPEN_THREE) + (self.FIVE_COUNT if cls == FIVE else 0)
+                              for cls in self.patterns]
+        
+        self.board = [Cell.EMPTY] * self.geometry.cells
+        self.codes = [None, list(self.base), list(self.base)]
+        self.totals = [0, 0, 0]
+        self.threats = [0, 0, 0]
+        self.history = []
+    
+    def load(self, board_state):
+        if self.value_source is not THREAT_SCORES:
+            self.values = [THREAT_SCORES[cls] for cls in self.patterns]
+            self.value_source = THREAT_SCORES
+        
+        self.board = board_state
+        self.codes = [None, list(self.base), list(self.base)]
+        self.totals = [0, 0, 0]
+        self.threats = [0, 0, 0]
+        self.history = []
+        for idx, piece in enumerate(board_state):
+            if piece != Cell.EMPTY:
+                self.shift_codes(idx, piece, 1)
+        
+        values = self.values
+        counts = self.threat_counts
+        for idx, piece in enumerate(board_state):
+            if piece != Cell.EMPTY:
+                continue
+            start = idx * self.slots_per_cell
+            for player in (Cell.BLACK, Cell.WHITE):
+                codes = self.codes[player]
+                self.totals[player] += sum(values[codes[slot]]
+                                           for slot in range(start, start + self.slots_per_cell))
+                self.threats[player] += sum(counts[codes[slot]]
+                                            for slot in range(start, start + self.slots_per_cell))
+    
+    def shift_codes(self, idx, player, sign):
+        opponent = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+        own = self.codes[player]
+        other = self.codes[opponent]
+        for slot, weight, _ in self.members[idx]:
+            own[slot] += sign * OWN * weight
+            other[slot] += sign * BLOCKED * weight
+    
+    def update(self, idx):
+        player = self.board[idx]
+        opponent = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+        own = self.codes[player]
+        other = self.codes[opponent]
+        values = self.values
+        counts = self.threat_counts
+        board = self.board
+        
+        # The cell stops scoring once it is occupied.
+        start = idx * self.slots_per_cell
+        own_delta = 0
+        other_delta = 0
+        own_threats = 0
+        other_threats = 0
+        for slot in range(start, start + self.slots_per_cell):
+            own_delta -= values[own[slot]]
+            other_delta -= values[other[slot]]
+            own_threats -= counts[own[slot]]
+            other_threats -= counts[other[slot]]
+        
+        for slot, weight, cell in self.members[idx]:
+            if board[cell] == Cell.EMPTY:
+                own_code = own[slot]
+                other_code = other[slot]
+                own[slot] = new_own = own_code + OWN * weight
+                other[slot] = new_other = other_code + BLOCKED * weight
+                own_delta += values[new_own] - values[own_code]
+                other_delta += values[new_other] - values[other_code]
+                own_threats += counts[new_own] - counts[own_code]
+                other_threats += counts[new_other] - counts[other_code]
+            else:
+                own[slot] += OWN * weight
+                other[slot] += BLOCKED * weight
+        
+        self.totals[player] += own_delta
+        self.totals[opponent] += other_delta
+        self.threats[player] += own_threats
+        self.threats[opponent] += other_threats
+        self.history.append((idx, player, own_delta, other_delta, own_threats, other_threats))
+    
+    def threat_class(self, idx, player):
+        # Class of player taking the empty cell idx, along its best direction.
+        start = idx * self.slots_per_cell
+        patterns = self.patterns
+        return max([patterns[code] for code in self.codes[player][start:start + self.slots_per_cell]])
+    
+    def undo(self):
+        idx, player, own_delta, other_delta, own_threats, other_threats = self.history.pop()
+        opponent = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+        self.shift_codes(idx, player, -1)
+        self.totals[player] -= own_delta
+        self.totals[opponent] -= other_delta
+        self.threats[player] -= own_threats
+        self.threats[opponent] -= other_threats
+    
+    def has_five(self, player):
+        # Some empty cell completes five for player.
+        return self.threats[player] >= self.FIVE_COUNT
+    
+    def has_threats(self, player):
+        # Some empty cell gives player an open three or better.
+        return self.threats[player] > 0
+    
+    def score(self, player):
+        opponent = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+        return self.totals[player] - self.totals[opponent]
+
+
+class CandidateFrontier:
+    RADIUS = 2
+    
+    def __init__(self, geometry=None):
+        self.geometry = geometry or default_geometry()
+        self.neighbours = self.geometry.neighbours(self.RADIUS)
+        
+        self.board = [Cell.EMPTY] * self.geometry.cells
+        self.counts = [0] * self.geometry.cells
+        self.cells = set()
+    
+    def load(self, board_state):
+        self.board = board_state
+        self.counts = [0] * self.geometry.cells
+        for idx, piece in enumerate(board_state):
+            if piece != Cell.EMPTY:
+                for n in self.neighbours[idx]:
+                    self.counts[n] += 1
+        self.cells = {idx for idx, piece in enumerate(board_state)
+                      if piece == Cell.EMPTY and self.counts[idx] > 0}
+    
+    def place(self, idx):
+        self.cells.discard(idx)
+        for n in self.neighbours[idx]:
+            self.counts[n] += 1
+            if self.board[n] == Cell.EMPTY:
+                self.cells.add(n)
+    
+    def remove(self, idx):
+        for n in self.neighbours[idx]:
+            self.counts[n] -= 1
+            if self.counts[n] == 0:
+                self.cells.discard(n)
+        if self.counts[idx] > 0:
+            self.cells.add(idx)
+    
+    def moves(self):
+        return [divmod(idx, self.geometry.size) for idx in sorted(self.cells)]
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+
+def evaluate_boards(boards, ai_player, win_length=None):
+    if load_numpy() is None:
+        raise RuntimeError("evaluate_boards requires numpy")
+    if win_length is None:
+        win_length = WINNING_LENGTH
+    
+    opponent = Cell.BLACK if ai_player == Cell.WHITE else Cell.WHITE
+    boards = np.asarray(boards, dtype=np.int8)
+    n, rows, cols = boards.shape
+    reach = win_length - 1
+    
+    # Off-board cells are padded with a value that is neither colour, so they
+    # read as BLOCKED for both players like the padding in segment codes.
+    padded = np.full((n, rows + 2 * reach, cols + 2 * reach), 3, dtype=np.int8)
+    padded[:, reach:reach + rows, reach:reach + cols] = boards
+    
+    empty = boards == Cell.EMPTY
+    values = np.array(THREAT_SCORES, dtype=np.int64)[
+        np.frombuffer(pattern_table(win_length, PATTERN_CACHE_DIR), dtype=np.uint8)]
+    scores = np.zeros(n, dtype=np.int64)
+    
+    for dr, dc in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+        ai_code = np.zeros(boards.shape, dtype=np.int64)
+        opponent_code = np.zeros(boards.shape, dtype=np.int64)
+        
+        weight = 1
+        for k in range(-reach, reach + 1):
+            r0 = reach + k * dr
+            c0 = reach + k * dc
+            window = padded[:, r0:r0 + rows, c0:c0 + cols]
+            ai_code += weight * np.where(window == ai_player, OWN,
+                                         np.where(window == Cell.EMPTY, 0, BLOCKED))
+            opponent_code += weight * np.where(window == opponent, OWN,
+                                               np.where(window == Cell.EMPTY, 0, BLOCKED))
+            weight *= 3
+        
+        scores += ((values[ai_code] - values[opponent_code]) * empty).sum(axis=(1, 2))
+    
+    return scores
+
+
+class SearchStats:
+    def __init__(self):
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_stores = 0
+        self.tt_overwrites = 0
+        self.cutoffs = {}
+        self.candidates = {}
+        self.iterations = []
+        self.principal_variation = []
+        self.source = "search"
+        self.seconds = 0.0
+        self.started = time.perf_counter()
+        self.table_counts = (0, 0, 0, 0)
+    
+    def start(self, table):
+        # The table counts all the time; the stats only keep the difference.
+        self.table_counts = (table.probes, table.hits, table.stores, table.overwrites)
+        self.started = time.perf_counter()
+    
+    def finish(self, table, nodes):
+        probes, hits, stores, overwrites = self.table_counts
+        self.tt_probes = table.probes - probes
+        self.tt_hits = table.hits - hits
+        self.tt_stores = table.stores - stores
+        self.tt_overwrites = table.overwrites - overwrites
+        self.nodes = nodes
+        self.seconds = time.perf_counter() - self.started
+    
+    def record_cutoff(self, index):
+        self.cutoffs[index] = self.cutoffs.get(index, 0) + 1
+    
+    def record_candidates(self, count):
+        self.candidates[count] = self.candidates.get(count, 0) + 1
+    
+    def record_iteration(self, depth, move, score, nodes):
+        self.iterations.append({
+            "depth": depth,
+            "move": list(move),
+            "score": score,
+            "nodes": nodes,
+            "seconds": round(time.perf_counter() - self.started, 4),
+        })
+    
+    def as_dict(self):
+        return {
+            "source": self.source,
+            "nodes": self.nodes,
+            "leaf_evals": self.leaf_evals,
+            "seconds": round(self.seconds, 4),
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_stores": self.tt_stores,
+            "tt_overwrites": self.tt_overwrites,
+            "cutoffs": dict(sorted(self.cutoffs.items())),
+            "candidates": dict(sorted(self.candidates.items())),
+            "iterations": self.iterations,
+            "principal_variation": [list(move) for move in self.principal_variation],
+        }
+
+
+class GomokuAI:
+    def __init__(self, workers=AI_WORKERS, geometry=None, tt_size_mb=None):
+        self.geometry = geometry or default_geometry()
+        self.size = self.geometry.size
+        self.win_length = self.geometry.win_length
+        self.transposition_table = TranspositionTable(tt_size_mb, self.geometry)
+        self.search_hash = 0
+        self.use_symmetry = USE_SYMMETRIC_TT
+        self.symmetric = False
+        self.symmetric_hashes = None
+        self.bitboard = BitBoard(self.geometry)
+        self.use_bitboard = USE_BITBOARD
+        self.threat_solver = ThreatSolver(self.bitboard)
+        # The book is only built for the default board shape.
+        self.opening_book = None
+        if USE_OPENING_BOOK and self.geometry is default_geometry():
+            self.opening_book = OpeningBook(self.geometry)
+        self.position_cache = PositionCache(self.geometry) if USE_POSITION_CACHE else None
+        self.last_score = 0
+        self.last_source = None
+        self.stats = None
+        self.evaluator = IncrementalEvaluator(self.geometry)
+        self.frontier = CandidateFrontier(self.geometry)
+        self.use_batch_eval = USE_BATCH_EVAL and load_numpy() is not None
+        self.nodes = 0
+        self.deadline = None
+        self.time_limit = None
+        self.node_limit = None
+        self.next_budget_check = 0
+        self.workers = workers
+        self.executor = None
+        self.shared_alpha = None
+        self.shared_nodes = None
+        self.searches = 0
+        # Set in worker processes, whose root moves draw on one node budget.
+        self.node_counter = None
+        self.counted_nodes = 0
+        self.cancel_event = threading.Event()
+        self.worker_cancel = None
+        self.ponder_results = {}
+        self.killers = [[-1, -1] for _ in range(self.geometry.cells + 2)]
+        self.history = [[0] * (self.geometry.cells) for _ in range(3)]
+    
+    def index(self, r, c):
+        return r * self.size + c
+    
+    def reset(self):
+        self.transposition_table.clear()
+    
+    def check_win(self, board_state, player):
+        for window in self.geometry.windows:
+            for idx in window:
+                if board_state[idx] != player:
+                    break
+            else:
+                return True
+        return False
+    
+    def check_win_fast(self, board_state, player, last_r, last_c):
+        if last_r is None or last_c is None:
+            return self.check_win(board_state, player)
+        
+        for forward, backward in self.geometry.rays[self.index(last_r, last_c)]:
+            count = 1
+            for idx in forward:
+                if board_state[idx] != player:
+                    break
+                count += 1
+            for idx in backward:
+                if board_state[idx] != player:
+                    break
+                count += 1
+            if count >= self.win_length:
+                return True
+        
+        return False
+    
+    def segment_code(self, board_state, segment, player):
+        code = 0
+        weight = 1
+        for idx in segment:
+            if idx < 0:
+                code += BLOCKED * weight
+            else:
+                cell = board_state[idx]
+                if cell == player:
+                    code += OWN * weight
+                elif cell != Cell.EMPTY:
+                    code += BLOCKED * weight
+            weight *= 3
+        return code
+    
+    def count_threat_level(self, board_state, player, r, c):
+        idx = self.index(r, c)
+        if board_state[idx] != Cell.EMPTY:
+            return 0
+        
+        max_threat = 0
+        patterns = self.evaluator.patterns
+        for segment in self.geometry.segments[idx]:
+            threat = patterns[self.segment_code(board_state, segment, player)]
+            if threat == FIVE:
+                return THREAT_LEVELS[FIVE]
+            max_threat = max(max_threat, THREAT_LEVELS[threat])
+        return max_threat
+    
+    def has_won(self, board_state, player):
+        if self.use_bitboard:
+            return self.bitboard.has_five(player)
+        return self.check_win(board_state, player)
+    
+    def is_winning_move(self, board_state, r, c, player):
+        if self.use_bitboard:
+            return self.bitboard.would_win(r, c, player)
+        board_state[self.index(r, c)] = player
+        win = self.check_win_fast(board_state, player, r, c)
+        board_state[self.index(r, c)] = Cell.EMPTY
+        return win
+    
+    def is_full(self, board_state):
+        if self.use_bitboard:
+            return self.bitboard.is_full()
+        return all(cell != Cell.EMPTY for cell in board_state)
+    
+    def generate_candidate_moves(self, board_state):
+        moves = []
+        
+        has_pieces = any(cell != Cell.EMPTY for cell in board_state)
+        
+        if not has_pieces:
+            center = self.size // 2
+            random_row = center + random.randint(-2, 2)
+            random_col = center + random.randint(-2, 2)
+            random_row = max(2, min(self.size - 3, random_row))
+            random_col = max(2, min(self.size - 3, random_col))
+            moves.append((random_row, random_col))
+            return moves
+        
+        considered = [[False] * self.size for _ in range(self.size)]
+        
+        for r in range(self.size):
+            for c in range(self.size):
+                if board_state[self.index(r, c)] != Cell.EMPTY:
+                    for dr in range(-2, 3):
+                        for dc in range(-2, 3):
+                            nr, nc = r + dr, c + dc
+                            if (0 <= nr < self.size and 0 <= nc < self.size and
+                                not considered[nr][nc] and 
+                                board_state[self.index(nr, nc)] == Cell.EMPTY):
+                                considered[nr][nc] = True
+                                moves.append((nr, nc))
+        
+        center = self.size // 2
+        if board_state[self.index(center, center)] == Cell.EMPTY:
+            moves.insert(0, (center, center))
+        
+        return moves
+    
+    def frontier_moves(self, board_state):
+        moves = self.frontier.moves()
+        center = self.size // 2
+        if board_state[self.index(center, center)] == Cell.EMPTY and (center, center) not in moves:
+            moves.insert(0, (center, center))
+        return moves
+    
+    def evaluate_board(self, board_state, ai_player):
+        opponent = Cell.BLACK if ai_player == Cell.WHITE else Cell.WHITE
+        patterns = self.evaluator.patterns
+        score = 0
+        
+        for idx, piece in enumerate(board_state):
+            if piece != Cell.EMPTY:
+                continue
+            for segment in self.geometry.segments[idx]:
+                score += THREAT_SCORES[patterns[self.segment_code(board_state, segment, ai_player)]]
+                score -= THREAT_SCORES[patterns[self.segment_code(board_state, segment, opponent)]]
+        
+        return score
+    
+    def load_search_state(self, board_state):
+        self.search_hash = self.transposition_table.compute_hash(board_state)
+        stones = len(board_state) - board_state.count(Cell.EMPTY)
+        self.symmetric = self.use_symmetry and stones <= SYMMETRY_MAX_STONES
+        if self.symmetric:
+            self.symmetric_hashes = self.transposition_table.compute_symmetric_hashes(board_state)
+        self.bitboard.load(board_state)
+        self.evaluator.load(board_state)
+        self.frontier.load(board_state)
+    
+    def make_move(self, board_state, r, c, player):
+        board_state[self.index(r, c)] = player
+        self.search_hash = self.transposition_table.update_hash(self.search_hash, r, c, player)
+        if self.symmetric:
+            keys = self.geometry.symmetric_keys[self.index(r, c)][player]
+            self.symmetric_hashes = [h ^ k for h, k in zip(self.symmetric_hashes, keys)]
+        self.bitboard.place(r, c, player)
+        self.evaluator.update(self.index(r, c))
+        self.frontier.place(self.index(r, c))
+    
+    def unmake_move(self, board_state, r, c, player):
+        board_state[self.index(r, c)] = Cell.EMPTY
+        self.search_hash = self.transposition_table.update_hash(self.search_hash, r, c, player)
+        if self.symmetric:
+            keys = self.geometry.symmetric_keys[self.index(r, c)][player]
+            self.symmetric_hashes = [h ^ k for h, k in zip(self.symmetric_hashes, keys)]
+        self.bitboard.remove(r, c, player)
+        self.evaluator.undo()
+        self.frontier.remove(self.index(r, c))
+    
+    def tt_key(self):
+        if not self.symmetric:
+            return self.search_hash, 0
+        key = min(self.symmetric_hashes)
+        return key, self.symmetric_hashes.index(key)
+    
+    def tt_key_after(self, r, c, player):
+        # tt_key() of the position after player takes (r, c).
+        if not self.symmetric:
+            return self.transposition_table.update_hash(self.search_hash, r, c, player)
+        keys = self.geometry.symmetric_keys[self.index(r, c)][player]
+        return min(h ^ k for h, k in zip(self.symmetric_hashes, keys))
+    
+    def tt_move_to_board(self, stored_move, transform):
+        if stored_move == -1 or transform == 0:
+            return stored_move
+        return self.transposition_table.symmetry_inverses[transform][stored_move]
+    
+    def board_move_to_tt(self, r, c, transform):
+        idx = self.index(r, c)
+        if transform == 0:
+            return idx
+        return self.transposition_table.symmetry_maps[transform][idx]
+    
+    def start_budget(self, time_limit, node_limit):
+        self.nodes = 0
+        self.node_limit = node_limit
+        self.time_limit = time_limit
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.next_budget_check = 0
+        self.counted_nodes = 0
+    
+    def count_shared_nodes(self):
+        with self.node_counter.get_lock():
+            self.node_counter.value += self.nodes - self.counted_nodes
+            total = self.node_counter.value
+        self.counted_nodes = self.nodes
+        return total
+    
+    def cancel(self):
+        self.cancel_event.set()
+        if self.worker_cancel is not None:
+            self.worker_cancel.set()
+    
+    def reset_cancel(self):
+        self.cancel_event.clear()
+    
+    def check_budget(self):
+        if self.cancel_event.is_set():
+            raise SearchTimeout()
+        nodes = self.nodes if self.node_counter is None else self.count_shared_nodes()
+        if self.node_limit is not None and nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+        self.next_budget_check = self.nodes + 16
+        if self.node_limit is not None and self.node_counter is None:
+            self.next_budget_check = min(self.next_budget_check, self.node_limit)
+    
+    def minimax(self, board_state, depth, alpha, beta, is_maximizing, ai_player, ply=1):
+        if is_maximizing:
+            return self.pvs(board_state, depth, alpha, beta, ai_player, ai_player, ply)
+        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
+        return -self.pvs(board_state, depth, -beta, -alpha, opponent, ai_player, ply)
+    
+    def pvs(self, board_state, depth, alpha, beta, player, ai_player, ply=1):
+        self.nodes += 1
+        if self.nodes >= self.next_budget_check:
+            self.check_budget()
+        
+        board_hash, transform = self.tt_key()
+        alpha_orig = alpha
+        
+        tt_move = -1
+        cached = self.transposition_table.get(board_hash)
+        if ((cached is None or cached[1] < depth) and self.position_cache is not None
+                and depth >= POSITION_CACHE_MIN_DEPTH):
+            warm = self.position_cache.get(board_hash, player)
+            if warm is not None and (cached is None or warm[1] > cached[1]):
+                cached = warm
+                self.transposition_table.set(board_hash, *warm)
+        if cached is not None:
+            cached_value, cached_depth, cached_flag, tt_move = cached
+            tt_move = self.tt_move_to_board(tt_move, transform)
+            if cached_depth >= depth:
+                if cached_flag == TTFlag.EXACT:
+                    return cached_value
+                elif cached_flag == TTFlag.LOWER:
+                    alpha = max(alpha, cached_value)
+                else:
+                    beta = min(beta, cached_value)
+                if beta <= alpha:
+                    return cached_value
+        
+        opponent = Cell.WHITE if player == Cell.BLACK else Cell.BLACK
+        ai_opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
+        # Scores are kept from the side to move's point of view; the
+        # evaluator is scored for ai_player and flipped for the opponent.
+        sign = 1 if player == ai_player else -1
+        
+        if self.has_won(board_state, ai_player):
+            return sign * (WIN_SCORE - depth)
+        if self.has_won(board_state, ai_opponent):
+            return -sign * (WIN_SCORE - depth)
+        if depth == 0 or self.is_full(board_state):
+            if self.stats is not None:
+                self.stats.leaf_evals += 1
+            if self.evaluator.has_five(player):
+                # The side to move completes five next; the static score
+                # cannot see that, since it does not know whose turn it is.
+                eval_score = WIN_SCORE - 1
+            else:
+                eval_score = sign * self.evaluator.score(ai_player)
+            self.transposition_table.set(board_hash, eval_score, depth)
+            return eval_score
+        
+        possible_moves = self.frontier_moves(board_state)
+        threats = self.move_threats(possible_moves, player)
+        if ply < STATIC_ORDER_PLIES:
+            self.sort_moves_by_priority(possible_moves, board_state, ai_player)
+            if tt_move != -1 and board_state[tt_move] == Cell.EMPTY:
+                move = divmod(tt_move, self.size)
+                if move in possible_moves:
+                    possible_moves.remove(move)
+                possible_moves.insert(0, move)
+        else:
+            possible_moves = self.order_moves(possible_moves, board_state, tt_move, ply, player, threats)
+        possible_moves = self.select_moves(possible_moves, ply, threats, tt_move)
+        
+        stats = self.stats
+        if stats is not None:
+            stats.record_candidates(len(possible_moves))
+        
+        best_move = possible_moves[0]
+        best_eval = float('-inf')
+        if depth == 1 and self.use_batch_eval:
+            scores = self.batch_leaf_scores(board_state, possible_moves, player, ai_player)
+            if stats is not None:
+                stats.leaf_evals += len(scores)
+            scores = [sign * score for score in scores]
+            best_eval = max(scores)
+            best_move = possible_moves[scores.index(best_eval)]
+        else:
+            for i, move in enumerate(possible_moves):
+                self.make_move(board_state, move[0], move[1], player)
+                if i == 0:
+                    eval_score = -self.pvs(board_state, depth - 1, -beta, -alpha, opponent, ai_player, ply + 1)
+                else:
+                    eval_score = -self.pvs(board_state, depth - 1, -alpha - 1, -alpha, opponent, ai_player, ply + 1)
+                    if alpha < eval_score < beta:
+                        eval_score = -self.pvs(board_state, depth - 1, -beta, -alpha, opponent, ai_player, ply + 1)
+                self.unmake_move(board_state, move[0], move[1], player)
+                
+                if eval_score > best_eval:
+                    best_eval = eval_score
+                    best_move = move
+                alpha = max(alpha, eval_score)
+                if alpha >= beta:
+                    self.record_cutoff(move, ply, player, depth)
+                    if stats is not None:
+                        stats.record_cutoff(i)
+                    break
+        
+        if best_eval <= alpha_orig:
+            flag = TTFlag.UPPER
+        elif best_eval >= beta:
+            flag = TTFlag.LOWER
+        else:
+            flag = TTFlag.EXACT
+        tt_best = self.board_move_to_tt(best_move[0], best_move[1], transform)
+        self.transposition_table.set(board_hash, best_eval, depth, flag, tt_best)
+        if self.position_cache is not None and depth >= POSITION_CACHE_MIN_DEPTH:
+            self.position_cache.record(board_hash, player, best_eval, depth, flag, tt_best)
+        return best_eval
+    
+    def move_threats(self, moves, player):
+        # Sets of the moves where player wins, must block a five, makes or
+        # stops a four, and makes an open three or better, read from the
+        # evaluator's pattern codes. A colour without any such cell is not
+        # looked at.
+        opponent = Cell.WHITE if player == Cell.BLACK else Cell.BLACK
+        wins, blocks, fours, threes = set(), set(), set(), set()
+        evaluator = self.evaluator
+        own_threats = evaluator.has_threats(player)
+        other_threats = evaluator.has_threats(opponent)
+        if not own_threats and not other_threats:
+            return wins, blocks, fours, threes
+        
+        # A cell has one code per direction, four in all. threat_counts is
+        # non-zero exactly for the codes that make an open three or better,
+        # so most cells are passed over after four lookups.
+        threat_class = evaluator.threat_class
+        counts = evaluator.threat_counts
+        own_codes = evaluator.codes[player] if own_threats else None
+        other_codes = evaluator.codes[opponent] if other_threats else None
+        for move in moves:
+            idx = move[0] * self.size + move[1]
+            s = idx * 4
+            if own_threats and (counts[own_codes[s]] or counts[own_codes[s + 1]]
+                                or counts[own_codes[s + 2]] or counts[own_codes[s + 3]]):
+                threes.add(move)
+                own = threat_class(idx, player)
+                if own >= FOUR:
+                    fours.add(move)
+                    if own == FIVE:
+                        wins.add(move)
+            if other_threats and (counts[other_codes[s]] or counts[other_codes[s + 1]]
+                                  or counts[other_codes[s + 2]] or counts[other_codes[s + 3]]):
+                other = threat_class(idx, opponent)
+                if other >= FOUR:
+                    fours.add(move)
+                    if other == FIVE:
+                        blocks.add(move)
+        return wins, blocks, fours, threes
+    
+    def order_moves(self, moves, board_state, tt_move, ply, player, threats):
+        history = self.history[player]
+        moves.sort(key=lambda move: history[move[0] * self.size + move[1]], reverse=True)
+        
+        # Wins and forced blocks come first, then the TT move and killers,
+        # then cells that make or stop a four; the rest keep history order.
+        wins, blocks, fours, _ = threats
+        fives = wins | blocks
+        
+        front = [move for move in moves if move in fives]
+        for idx in [tt_move] + self.killers[ply]:
+            if idx != -1 and board_state[idx] == Cell.EMPTY:
+                front.append(divmod(idx, self.size))
+        front.extend(move for move in moves if move in fours)
+        
+        if not front:
+            return moves
+        ordered = []
+        seen = set()
+        for move in front + moves:
+            if move not in seen:
+                seen.add(move)
+                ordered.append(move)
+        return ordered
+    
+    def select_moves(self, moves, ply, threats, tt_move=-1):
+        # Keeps the given order. A win, or the blocks when the opponent
+        # threatens five, leave nothing else worth searching; otherwise every
+        # forcing move stays and only the quiet tail is cut to the beam width.
+        wins, blocks, fours, threes = threats
+        if wins or blocks:
+            target = wins or blocks
+            forced = [move for move in moves if move in target]
+            if forced:
+                return forced[:1] if wins else forced
+        
+        quiet = self.beam_width(ply)
+        selected = []
+        for move in moves:
+            if (move in fours or move in threes
+                    or move[0] * self.size + move[1] == tt_move):
+                selected.append(move)
+            elif quiet > 0:
+                selected.append(move)
+                quiet -= 1
+        return selected
+    
+    def beam_width(self, ply):
+        width = max(BEAM_MIN_WIDTH, BEAM_WIDTH - BEAM_PLY_STEP * ply)
+        if self.deadline is not None and self.time_limit:
+            left = (self.deadline - time.perf_counter()) / self.time_limit
+            width = BEAM_MIN_WIDTH + int((width - BEAM_MIN_WIDTH) * min(1.0, max(0.0, 2 * left)))
+        return width
+    
+    def record_cutoff(self, move, ply, player, depth):
+        idx = self.index(move[0], move[1])
+        self.history[player][idx] += depth * depth
+        killers = self.killers[ply]
+        if killers[0] != idx:
+            killers[1] = killers[0]
+            killers[0] = idx
+    
+    def reset_move_ordering(self):
+        for killers in self.killers:
+            killers[0] = killers[1] = -1
+        for table in self.history:
+            for idx in range(len(table)):
+                table[idx] = 0
+    
+    def batch_leaf_scores(self, board_state, moves, mover, ai_player):
+        self.nodes += len(moves)
+        win_score = WIN_SCORE if mover == ai_player else -WIN_SCORE
+        
+        boards = np.repeat(np.array(board_state, dtype=np.int8).reshape(1, self.size, self.size),
+                           len(moves), axis=0)
+        rows = [move[0] for move in moves]
+        cols = [move[1] for move in moves]
+        boards[np.arange(len(moves)), rows, cols] = mover
+        scores = evaluate_boards(boards, ai_player, self.win_length).tolist()
+        
+        # Each child is finished the way pvs scores a leaf: an exact table
+        # entry wins, then a win ends the game, a five for the side to reply
+        # is a win for it, and the result is stored under the child's key.
+        replier = Cell.WHITE if mover == Cell.BLACK else Cell.BLACK
+        reply_sign = 1 if replier == ai_player else -1
+        for i, (r, c) in enumerate(moves):
+            key = self.tt_key_after(r, c, mover)
+            cached = self.transposition_table.get(key)
+            if cached is not None and cached[2] == TTFlag.EXACT:
+                scores[i] = reply_sign * cached[0]
+                continue
+            if self.is_winning_move(board_state, r, c, mover):
+                scores[i] = win_score
+                continue
+            self.bitboard.place(r, c, mover)
+            if self.threat_solver.five_cells(replier):
+                scores[i] = reply_sign * (WIN_SCORE - 1)
+            self.bitboard.remove(r, c, mover)
+            self.transposition_table.set(key, reply_sign * scores[i], 0)
+        return scores
+    
+    def sort_moves_by_priority(self, moves, board_state, ai_player):
+        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
+        
+        def get_priority(move):
+            priority = 0
+            r, c = move[0], move[1]
+            
+            if self.is_winning_move(board_state, r, c, ai_player):
+                priority += 100000
+            
+            if self.is_winning_move(board_state, r, c, opponent):
+                priority += 90000
+            
+            ai_threat = self.count_threat_level(board_state, ai_player, r, c)
+            priority += ai_threat
+            
+            opponent_threat = self.count_threat_level(board_state, opponent, r, c)
+            priority += opponent_threat * 1.5
+            
+            center_dist = abs(r - self.size//2) + abs(c - self.size//2)
+            priority += (self.size - center_dist) * 5
+            
+            return priority
+        
+        moves.sort(key=get_priority, reverse=True)
+    
+    def get_best_move(self, board_state, ai_player, time_limit=None, node_limit=None, max_depth=None,
+                      stats=None, kind="move"):
+        if stats is None and AI_SEARCH_STATS:
+            stats = SearchStats()
+        if stats is not None:
+            stats.start(self.transposition_table)
+        started = time.perf_counter()
+        self.nodes = 0
+        self.stats = stats
+        try:
+            best_move, depth, source = self.search_best_move(board_state, ai_player, time_limit,
+                                                             node_limit, max_depth)
+        finally:
+            self.stats = None
+            if self.position_cache is not None:
+                self.position_cache.flush()
+        self.last_source = source
+        
+        record = {
+            "move": list(best_move),
+            "score": self.last_score,
+            "depth": depth,
+            "nodes": self.nodes,
+            "threat_nodes": self.threat_solver.nodes,
+            "seconds": round(time.perf_counter() - started, 4),
+            "source": source,
+            "kind": kind,
+        }
+        if stats is not None:
+            stats.source = source
+            stats.finish(self.transposition_table, self.nodes)
+            if source == "search":
+                stats.principal_variation = self.principal_variation(board_state, ai_player, depth)
+            record["stats"] = stats.as_dict()
+        logger.info("search %s", json.dumps(record))
+        return best_move
+    
+    def search_best_move(self, board_state, ai_player, time_limit, node_limit, max_depth):
+        best_move = (-1, -1)
+        best_score = float('-inf')
+        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
+        self.load_search_state(board_state)
+        self.last_score = 0
+        self.start_budget(time_limit, node_limit)
+        
+        if self.opening_book is not None:
+            entry = self.opening_book.lookup(board_state, ai_player)
+            if entry is not None:
+                book_move, self.last_score = entry
+                return book_move, 0, "book"
+        
+        # The pre-pass gets a share of the move's budget, so whatever it
+        # cannot prove in that time is left to the main search.
+        threat_nodes = THREAT_NODE_LIMIT
+        if node_limit is not None:
+            threat_nodes = min(threat_nodes, max(1, int(node_limit * THREAT_BUDGET_SHARE)))
+        threat_deadline = None
+        if time_limit is not None:
+            threat_deadline = time.perf_counter() + time_limit * THREAT_BUDGET_SHARE
+        solver = self.threat_solver
+        solver.start(threat_nodes, threat_deadline)
+        # Proven wins and losses are scored like search wins; a forced move
+        # that decides nothing keeps a score of 0.
+        threat_move = solver.winning_move(ai_player)
+        if threat_move is not None:
+            self.last_score = WIN_SCORE - 1
+            return threat_move, 0, "threat"
+        blocks = solver.five_cells(opponent)
+        if blocks:
+            if blocks & (blocks - 1):
+                self.last_score = -(WIN_SCORE - 2)
+            return solver.winning_move(opponent), 0, "threat"
+        threat_move = solver.solve(ai_player)
+        if threat_move is not None:
+            self.last_score = WIN_SCORE - solver.win_plies
+            return threat_move, 0, "threat"
+        
+        defences = solver.defences(opponent)
+        if defences and len(defences) == 1:
+            return defences[0], 0, "threat"
+        
+        if defences:
+            possible_moves = defences
+        else:
+            possible_moves = self.generate_candidate_moves(board_state)
+        self.sort_moves_by_priority(possible_moves, board_state, ai_player)
+        # Every defence is forcing, so only an open candidate list is cut.
+        if not defences:
+            possible_moves = self.select_moves(possible_moves, 0, self.move_threats(possible_moves, ai_player))
+        
+        root_hash, root_transform = self.tt_key()
+        self.transposition_table.new_search()
+        self.searches += 1
+        if self.position_cache is not None:
+            warm = self.position_cache.get(root_hash, ai_player)
+            if warm is not None:
+                self.transposition_table.set(root_hash, *warm)
+        self.reset_move_ordering()
+        
+        if max_depth is not None:
+            depths = range(max_depth)
+        elif time_limit is None and node_limit is None:
+            depths = [AI_SEARCH_DEPTH - 3]
+        else:
+            depths = range(board_state.count(Cell.EMPTY))
+        
+        saved_board = board_state[:]
+        completed_depth = -1
+        previous_score = None
+        for depth in depths:
+            cached = self.transposition_table.get(root_hash)
+            if cached is not None and cached[3] != -1:
+                move = divmod(self.tt_move_to_board(cached[3], root_transform), self.size)
+                if move in possible_moves:
+                    possible_moves.remove(move)
+                    possible_moves.insert(0, move)
+            
+            try:
+                if self.workers > 1:
+                    move, score = self.search_root_parallel(board_state, possible_moves, depth, ai_player)
+                else:
+                    move, score = self.search_root_aspiration(board_state, possible_moves, depth,
+                                                              ai_player, previous_score)
+            except SearchTimeout:
+                board_state[:] = saved_board
+                self.load_search_state(board_state)
+                break
+            
+            best_move, best_score = move, score
+            previous_score = score
+            completed_depth = depth
+            if self.stats is not None:
+                self.stats.record_iteration(depth + 1, move, score, self.nodes)
+            root_move = self.board_move_to_tt(move[0], move[1], root_transform)
+            self.transposition_table.set(root_hash, score, depth + 1, TTFlag.EXACT, root_move)
+            if self.position_cache is not None and depth + 1 >= POSITION_CACHE_MIN_DEPTH:
+                self.position_cache.record(root_hash, ai_player, score, depth + 1, TTFlag.EXACT, root_move)
+            if best_score >= WIN_SCORE - self.geometry.cells:
+                break
+        
+        if best_move == (-1, -1):
+            best_move = possible_moves[0]
+        self.last_score = best_score
+        return best_move, completed_depth + 1, "search"
+    
+    def principal_variation(self, board_state, ai_player, length):
+        board = board_state[:]
+        self.load_search_state(board)
+        player = ai_player
+        line = []
+        while len(line) < length:
+            key, transform = self.tt_key()
+            cached = self.transposition_table.get(key)
+            if cached is None or cached[3] == -1:
+                break
+            idx = self.tt_move_to_board(cached[3], transform)
+            if board[idx] != Cell.EMPTY:
+                break
+            r, c = divmod(idx, self.size)
+            line.append((r, c))
+            self.make_move(board, r, c, player)
+            if self.has_won(board, player):
+                break
+            player = Cell.WHITE if player == Cell.BLACK else Cell.BLACK
+        self.load_search_state(board_state)
+        return line
+    
+    def search_root(self, board_state, possible_moves, depth, ai_player,
+                    alpha=float('-inf'), beta=float('inf')):
+        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
+        best_move = (-1, -1)
+        best_score = float('-inf')
+        
+        for i, move in enumerate(possible_moves):
+            self.make_move(board_state, move[0], move[1], ai_player)
+            if i == 0:
+                score = -self.pvs(board_state, depth, -beta, -alpha, opponent, ai_player)
+            else:
+                score = -self.pvs(board_state, depth, -alpha - 1, -alpha, opponent, ai_player)
+                if alpha < score < beta:
+                    score = -self.pvs(board_state, depth, -beta, -alpha, opponent, ai_player)
+            self.unmake_move(board_state, move[0], move[1], ai_player)
+            
+            if score > best_score:
+                best_score = score
+                best_move = move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        
+        return best_move, best_score
+    
+    def search_root_aspiration(self, board_state, possible_moves, depth, ai_player, previous_score):
+        if previous_score is None or abs(previous_score) >= WIN_SCORE - self.geometry.cells:
+            return self.search_root(board_state, possible_moves, depth, ai_player)
+        
+        alpha = previous_score - ASPIRATION_WINDOW
+        beta = previous_score + ASPIRATION_WINDOW
+        move, score = self.search_root(board_state, possible_moves, depth, ai_player, alpha, beta)
+        if alpha < score < beta:
+            return move, score
+        return self.search_root(board_state, possible_moves, depth, ai_player)
+    
+    def ponder(self, board_state, ai_player, time_limit=None, node_limit=None, replies=None):
+        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
+        if replies is None:
+            replies = PONDER_REPLIES
+        self.ponder_results = {}
+        
+        self.load_search_state(board_state)
+        guesses = self.generate_candidate_moves(board_state)
+        self.sort_moves_by_priority(guesses, board_state, opponent)
+        
+        for move in guesses[:replies]:
+            if self.cancel_event.is_set():
+                break
+            if self.is_winning_move(board_state, move[0], move[1], opponent):
+                continue
+            
+            board = board_state[:]
+            board[self.index(move[0], move[1])] = opponent
+            best_move = self.get_best_move(board, ai_player, time_limit, node_limit, kind="ponder")
+            if not self.cancel_event.is_set():
+                self.ponder_results[move] = best_move
+        
+        return self.ponder_results
+    
+    def get_executor(self):
+        if self.executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            self.shared_alpha = multiprocessing.Value('d', float('-inf'))
+            self.shared_nodes = multiprocessing.Value('q', 0)
+            self.worker_cancel = multiprocessing.Event()
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                initializer=init_search_worker,
+                                                initargs=(self.shared_alpha, self.shared_nodes,
+                                                          self.worker_cancel, self.size,
+                                                          self.win_length))
+        return self.executor
+    
+    def shutdown(self):
+        if self.position_cache is not None:
+            self.position_cache.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+    
+    def search_root_parallel(self, board_state, possible_moves, depth, ai_player):
+        executor = self.get_executor()
+        self.shared_alpha.value = float('-inf')
+        if self.cancel_event.is_set():
+            raise SearchTimeout()
+        self.worker_cancel.clear()
+        
+        # Root moves may wait in the queue for a free worker, so they get the
+        # absolute deadline rather than a time limit that starts on pickup.
+        # Wall-clock time is used as the one clock every process shares.
+        deadline = None
+        if self.deadline is not None:
+            time_left = self.deadline - time.perf_counter()
+            if time_left <= 0:
+                raise SearchTimeout()
+            deadline = time.time() + time_left
+        # The workers add their nodes to one shared count, so the iteration
+        # stops when the whole search reaches the node limit, as it does
+        # when searched serially.
+        self.shared_nodes.value = self.nodes
+        
+        futures = [executor.submit(search_root_move, board_state, move, depth, ai_player,
+                                   deadline, self.node_limit, self.searches)
+                   for move in possible_moves]
+        try:
+            pending = futures
+            while pending:
+                if self.cancel_event.is_set():
+                    raise SearchTimeout()
+                if self.deadline is not None and time.perf_counter() >= self.deadline:
+                    raise SearchTimeout()
+                done, pending = wait(pending, timeout=0.05, return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+            results = [future.result() for future in futures]
+        except SearchTimeout:
+            self.worker_cancel.set()
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            self.nodes = self.shared_nodes.value
+        
+        # Workers search against the best root score seen so far, so a score
+        # equal to the alpha it was given is only an upper bound.
+        best_move = (-1, -1)
+        best_score = float('-inf')
+        best_exact = False
+        for move, score, alpha in results:
+            exact = score > alpha
+            if score > best_score or (score == best_score and exact and not best_exact):
+                best_score = score
+                best_move = move
+                best_exact = exact
+        
+        return best_move, best_score
+    
+
+search_worker_ai = None
+search_worker_alpha = None
+search_worker_player = None
+search_worker_search = None
+
+
+def init_search_worker(shared_alpha, shared_nodes, cancel_event, size, win_length):
+    global search_worker_ai, search_worker_alpha
+    search_worker_ai = GomokuAI(workers=1, geometry=get_geometry(size, win_length))
+    # Only the parent writes the position cache.
+    if search_worker_ai.position_cache is not None:
+        search_worker_ai.position_cache.close()
+        search_worker_ai.position_cache = None
+    search_worker_ai.cancel_event = cancel_event
+    search_worker_ai.node_counter = shared_nodes
+    search_worker_alpha = shared_alpha
+
+
+def search_root_move(board_state, move, depth, ai_player, deadline, node_limit, search):
+    global search_worker_player, search_worker_search
+    time_limit = None
+    if deadline is not None:
+        time_limit = deadline - time.time()
+        if time_limit <= 0:
+            raise SearchTimeout()
+    
+    ai = search_worker_ai
+    if search_worker_player != ai_player:
+        ai.reset()
+        search_worker_player = ai_player
+    # A new root search starts from clean killers and history and ages the
+    # table, as the serial search does; moves of one search share them.
+    if search_worker_search != search:
+        ai.reset_move_ordering()
+        ai.transposition_table.new_search()
+        search_worker_search = search
+    
+    ai.start_budget(time_limit, node_limit)
+    ai.load_search_state(board_state)
+    alpha = search_worker_alpha.value
+    
+    ai.make_move(board_state, move[0], move[1], ai_player)
+    try:
+        score = ai.minimax(board_state, depth, alpha, float('inf'), False, ai_player)
+    finally:
+        ai.count_shared_nodes()
+    
+    with search_worker_alpha.get_lock():
+        if score > search_worker_alpha.value:
+            search_worker_alpha.value = score
+    return move, score, alpha
@@ -0,0 +1,185 @@
+import random
+
+
+class Geometry:
+    DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+    
+    def __init__(self, size, win_length):
+        if not 1 < win_length <= size:
+            raise ValueError(f"win length {win_length} does not fit a {size}x{size} board")
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.center = size // 2
+        
+        # Drawn from the same seed and in the same order as the original
+        # 10x10 table, so hashes and opening books stay valid on that size.
+        rng = random.Random(42)
+        self.zobrist = [[[rng.getrandbits(64) for _ in range(3)]
+                         for _ in range(size)]
+                        for _ in range(size)]
+        
+        self.symmetry_maps, self.symmetry_inverses = self.build_symmetry_maps()
+        self.symmetric_keys = None
+        self.lines, self.cell_lines = self.build_lines()
+        self.rays = self.build_rays()
+        self.windows, self.cell_windows = self.build_windows()
+        self.segments, self.segment_members, self.segment_base = self.build_segments()
+        self.neighbour_tables = {}
+    
+    def index(self, r, c):
+        return r * self.size + c
+    
+    def in_bounds(self, r, c):
+        return 0 <= r < self.size and 0 <= c < self.size
+    
+    def build_symmetry_maps(self):
+        n = self.size
+        maps = []
+        for transpose in (False, True):
+            for flip_r in (False, True):
+                for flip_c in (False, True):
+                    mapping = []
+                    for r in range(n):
+                        for c in range(n):
+                            nr, nc = (c, r) if transpose else (r, c)
+                            if flip_r:
+                                nr = n - 1 - nr
+                            if flip_c:
+                                nc = n - 1 - nc
+                            mapping.append(nr * n + nc)
+                    maps.append(mapping)
+        
+        inverse_maps = []
+        for mapping in maps:
+            inverse = [0] * len(mapping)
+            for idx, target in enumerate(mapping):
+                inverse[target] = idx
+            inverse_maps.append(inverse)
+        return maps, inverse_maps
+    
+    def build_lines(self):
+        # Every full row, column and diagonal as a list of flat indices.
+        lines = []
+        cell_lines = [[] for _ in range(self.cells)]
+        for dr, dc in self.DIRECTIONS:
+            for r in range(self.size):
+                for c in range(self.size):
+                    if self.in_bounds(r - dr, c - dc):
+                        continue
+                    line = []
+                    nr, nc = r, c
+                    while self.in_bounds(nr, nc):
+                        line.append(self.index(nr, nc))
+                        nr, nc = nr + dr, nc + dc
+                    for idx in line:
+                        cell_lines[idx].append(len(lines))
+                    lines.append(line)
+        return lines, cell_lines
+    
+    def build_rays(self):
+        # rays[idx] holds one (forward, backward) pair per direction, each
+        # reaching win_length - 1 cells out from idx and clipped at the edge.
+        reach = self.win_length - 1
+        rays = []
+        for r in range(self.size):
+            for c in range(self.size):
+                per_direction = []
+                for dr, dc in self.DIRECTIONS:
+                    pair = []
+                    for sign in (1, -1):
+                        ray = []
+                        for i in range(1, reach + 1):
+                            nr, nc = r + sign * i * dr, c + sign * i * dc
+                            if not self.in_bounds(nr, nc):
+                                break
+                            ray.append(self.index(nr, nc))
+                        pair.append(tuple(ray))
+                    per_direction.append(tuple(pair))
+                rays.append(tuple(per_direction))
+        return rays
+    
+    def build_windows(self):
+        # Every run of win_length cells, and the windows through each cell.
+        windows = []
+        cell_windows = [[] for _ in range(self.cells)]
+        for line in self.lines:
+            for start in range(len(line) - self.win_length + 1):
+                window = tuple(line[start:start + self.win_length])
+                for idx in window:
+                    cell_windows[idx].append(window)
+                windows.append(window)
+        return windows, [tuple(per_cell) for per_cell in cell_windows]
+    
+    def build_segments(self):
+        # segments[idx][d] lists the 2 * win_length - 1 cells centred on idx
+        # along direction d, with -1 where the segment runs off the board.
+        reach = self.win_length - 1
+        segments = []
+        for r in range(self.size):
+            for c in range(self.size):
+                per_direction = []
+                for dr, dc in self.DIRECTIONS:
+                    segment = []
+                    for k in range(-reach, reach + 1):
+                        nr, nc = r + k * dr, c + k * dc
+                        segment.append(self.index(nr, nc) if self.in_bounds(nr, nc) else -1)
+                    per_direction.append(tuple(segment))
+                segments.append(tuple(per_direction))
+        
+        # Segment codes live in slots cell * 4 + direction. members[idx] lists
+        # (slot, weight, cell) for every other cell whose segment covers idx,
+        # and base[slot] holds the off-board padding, which is digit 2.
+        members = [[] for _ in range(self.cells)]
+        base = [0] * (self.cells * len(self.DIRECTIONS))
+        for cell, per_direction in enumerate(segments):
+            for d, segment in enumerate(per_direction):
+                slot = cell * len(self.DIRECTIONS) + d
+                weight = 1
+                for k, idx in enumerate(segment):
+                    if idx < 0:
+                        base[slot] += 2 * weight
+                    elif k != reach:
+                        members[idx].append((slot, weight, cell))
+                    weight *= 3
+        return segments, [tuple(per_cell) for per_cell in members], base
+    
+    def symmetric_piece_keys(self):
+        # symmetric_keys[idx][piece] holds the key of that stone in each of
+        # the 8 orientations, so all 8 hashes move together on make/unmake.
+        if self.symmetric_keys is None:
+            keys = []
+            for idx in range(self.cells):
+                per_piece = []
+                for piece in range(3):
+                    per_orientation = []
+                    for mapping in self.symmetry_maps:
+                        r, c = divmod(mapping[idx], self.size)
+                        per_orientation.append(self.zobrist[r][c][piece])
+                    per_piece.append(tuple(per_orientation))
+                keys.append(per_piece)
+            self.symmetric_keys = keys
+        return self.symmetric_keys
+    
+    def neighbours(self, radius):
+        if radius not in self.neighbour_tables:
+            table = [[] for _ in range(self.cells)]
+            for r in range(self.size):
+                for c in range(self.size):
+                    for dr in range(-radius, radius + 1):
+                        for dc in range(-radius, radius + 1):
+                            if (dr or dc) and self.in_bounds(r + dr, c + dc):
+                                table[self.index(r, c)].append(self.index(r + dr, c + dc))
+            self.neighbour_tables[radius] = table
+        return self.neighbour_tables[radius]
+
+
+geometries = {}
+
+
+def get_geometry(size, win_length):
+    # Tables are built once per board shape and shared by every game on it.
+    key = (size, win_length)
+    if key not in geometries:
+        geometries[key] = Geometry(size, win_length)
+    return geometries[key]
@@ -1,23 +1,12 @@
 import turtle
-import time
-import random
+import threading
+import logging
 from enum import Enum
 
-human_wins = 0
-computer_wins = 0
-current_round = 1
+from engine import AI_NODE_LIMIT, AI_PONDER, AI_TIME_LIMIT, Cell, GomokuAI, default_geometry
 
-def reset_scores():
-    global human_wins, computer_wins, current_round
-    human_wins = 0
-    computer_wins = 0
-    current_round = 1
-
-BOARD_SIZE = 10
 WINDOW_WIDTH = 1080
 WINDOW_HEIGHT = 720
-WINNING_LENGTH = 5
-AI_SEARCH_DEPTH = 5
 
 WHITE_COLOR = (1, 1, 1)
 BLACK_COLOR = (0.1, 0.1, 0.1)
@@ -37,44 +26,6 @@ class GameState(Enum):
     GAME_OVER = 5
 
 
-class Cell:
-    EMPTY = 0
-    BLACK = 1
-    WHITE = 2
-
-
-class TranspositionTable:
-    def __init__(self):
-        self.cache = {}
-        random.seed(42)
-        self.zobrist = [[[random.getrandbits(64) for _ in range(3)] 
-                         for _ in range(BOARD_SIZE)] 
-                        for _ in range(BOARD_SIZE)]
-    
-    def compute_hash(self, board):
-        h = 0
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                piece = board[r * BOARD_SIZE + c]
-                if piece != Cell.EMPTY:
-                    h ^= self.zobrist[r][c][piece]
-        return h
-    
-    def contains(self, hash_key):
-        return hash_key in self.cache
-    
-    def get(self, hash_key):
-        entry = self.cache.get(hash_key)
-        return entry if entry is not None else None
-    
-    def set(self, hash_key, value, depth):
-        if hash_key not in self.cache or self.cache[hash_key][1] <= depth:
-            self.cache[hash_key] = (value, depth)
-    
-    def clear(self):
-        self.cache.clear()
-
-
 class Button:
     def __init__(self, x, y, width, height, text):
         self.x = x
@@ -109,16 +60,21 @@ class Button:
 
 
 class GomokuGame:
-    def __init__(self):
+    def __init__(self, geometry=None):
+        self.geometry = geometry or default_geometry()
+        self.size = self.geometry.size
         self.state = GameState.MENU
-        self.board = [Cell.EMPTY] * (BOARD_SIZE * BOARD_SIZE)
+        self.board = [Cell.EMPTY] * (self.geometry.cells)
         self.human_color = Cell.WHITE
         self.computer_color = Cell.BLACK
         self.is_human_turn = True
         self.winner = Cell.EMPTY
         self.is_game_over = False
         self.score_updated = False
-        self.transposition_table = TranspositionTable()
+        self.human_wins = 0
+        self.computer_wins = 0
+        self.current_round = 1
+        self.ai = GomokuAI(geometry=self.geometry)
         self.last_move = None
         
         self.thinking_turtle = turtle.Turtle()
@@ -127,6 +83,10 @@ class GomokuGame:
         self.thinking_turtle.penup()
         self.thinking_angle = 0
         self.is_thinking = False
+        self.search_thread = None
+        self.search_generation = 0
+        self.search_result = None
+        self.ponder_thread = None
         
         self.turtle_screen = turtle.Screen()
         self.turtle_screen.setup(WINDOW_WIDTH, WINDOW_HEIGHT)
@@ -140,7 +100,7 @@ class GomokuGame:
         
         board_margin = 40
         board_size_px = min(WINDOW_WIDTH - 2 * board_margin - 200, WINDOW_HEIGHT - 2 * board_margin - 60)
-        self.cell_size = board_size_px / (BOARD_SIZE - 1)
+        self.cell_size = board_size_px / (self.size - 1)
         self.board_x = WINDOW_WIDTH/2 - board_size_px - board_margin - 100
         self.board_y = -board_size_px/2 + 20
         
@@ -164,15 +124,23 @@ class GomokuGame:
         self.main_menu_button = Button(-WINDOW_WIDTH/2 + 50, 170, 250, 50, "Main Menu")
     
     def index(self, r, c):
-        return r * BOARD_SIZE + c
+        return r * self.size + c
+    
+    def reset_scores(self):
+        self.human_wins = 0
+        self.computer_wins = 0
+        self.current_round = 1
     
     def reset_board(self):
-        self.board = [Cell.EMPTY] * (BOARD_SIZE * BOARD_SIZE)
+        self.board = [Cell.EMPTY] * (self.geometry.cells)
         self.winner = Cell.EMPTY
         self.is_game_over = False
         self.score_updated = False
         self.last_move = None
-        self.transposition_table.clear()
+        self.cancel_thinking()
+        self.stop_pondering()
+        self.ai.ponder_results = {}
+        self.ai.reset()
     
     def board_pos_to_cell(self, x, y):
         rel_x = x - self.board_x
@@ -184,431 +152,95 @@ class GomokuGame:
         c = int((rel_x + self.cell_size * 0.5) / self.cell_size + 0.0001)
         r = int((rel_y + self.cell_size * 0.5) / self.cell_size + 0.0001)
         
-        if r < 0 or r >= BOARD_SIZE or c < 0 or c >= BOARD_SIZE:
+        if r < 0 or r >= self.size or c < 0 or c >= self.size:
             return -1, -1
         
         return r, c
     
-    def check_win(self, board_state, player):
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if board_state[self.index(r, c)] != player:
-                    continue
-                
-                if c <= BOARD_SIZE - WINNING_LENGTH:
-                    win = True
-                    for i in range(1, WINNING_LENGTH):
-                        if board_state[self.index(r, c + i)] != player:
-                            win = False
-                            break
-                    if win:
-                        return True
-                
-                if r <= BOARD_SIZE - WINNING_LENGTH:
-                    win = True
-                    for i in range(1, WINNING_LENGTH):
-                        if board_state[self.index(r + i, c)] != player:
-                            win = False
-                            break
-                    if win:
-                        return True
-                
-                if r <= BOARD_SIZE - WINNING_LENGTH and c <= BOARD_SIZE - WINNING_LENGTH:
-                    win = True
-                    for i in range(1, WINNING_LENGTH):
-                        if board_state[self.index(r + i, c + i)] != player:
-                            win = False
-                            break
-                    if win:
-                        return True
-                
-                if r <= BOARD_SIZE - WINNING_LENGTH and c >= WINNING_LENGTH - 1:
-                    win = True
-                    for i in range(1, WINNING_LENGTH):
-                        if board_state[self.index(r + i, c - i)] != player:
-                            win = False
-                            break
-                    if win:
-                        return True
-        
-        return False
-    
-    def check_win_fast(self, board_state, player, last_r, last_c):
-        if last_r is None or last_c is None:
-            return self.check_win(board_state, player)
-        
-        count = 1
-        c = last_c - 1
-        while c >= 0 and board_state[self.index(last_r, c)] == player:
-            count += 1
-            c -= 1
-        c = last_c + 1
-        while c < BOARD_SIZE and board_state[self.index(last_r, c)] == player:
-            count += 1
-            c += 1
-        if count >= WINNING_LENGTH:
-            return True
-        
-        count = 1
-        r = last_r - 1
-        while r >= 0 and board_state[self.index(r, last_c)] == player:
-            count += 1
-            r -= 1
-        r = last_r + 1
-        while r < BOARD_SIZE and board_state[self.index(r, last_c)] == player:
-            count += 1
-            r += 1
-        if count >= WINNING_LENGTH:
-            return True
-        
-        count = 1
-        r, c = last_r - 1, last_c - 1
-        while r >= 0 and c >= 0 and board_state[self.index(r, c)] == player:
-            count += 1
-            r -= 1
-            c -= 1
-        r, c = last_r + 1, last_c + 1
-        while r < BOARD_SIZE and c < BOARD_SIZE and board_state[self.index(r, c)] == player:
-            count += 1
-            r += 1
-            c += 1
-        if count >= WINNING_LENGTH:
-            return True
-        
-        count = 1
-        r, c = last_r - 1, last_c + 1
-        while r >= 0 and c < BOARD_SIZE and board_state[self.index(r, c)] == player:
-            count += 1
-            r -= 1
-            c += 1
-        r, c = last_r + 1, last_c - 1
-        while r < BOARD_SIZE and c >= 0 and board_state[self.index(r, c)] == player:
-            count += 1
-            r += 1
-            c -= 1
-        if count >= WINNING_LENGTH:
-            return True
-        
-        return False
-    
-    def count_threat_level(self, board_state, player, r, c):
-        if board_state[self.index(r, c)] != Cell.EMPTY:
-            return 0
-        
-        max_threat = 0
-        directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
-        
-        for dr, dc in directions:
-            count = 0
-            open_ends = 0
-            
-            pos_count = 0
-            for i in range(1, 5):
-                nr, nc = r + i * dr, c + i * dc
-                if 0 <= nr < BOARD_SIZE and 0 <= nc < BOARD_SIZE:
-                    if board_state[self.index(nr, nc)] == player:
-                        pos_count += 1
-                    elif board_state[self.index(nr, nc)] == Cell.EMPTY:
-                        open_ends += 1
-                        break
-                    else:
-                        break
-                else:
-                    break
-            
-            neg_count = 0
-            for i in range(1, 5):
-                nr, nc = r - i * dr, c - i * dc
-                if 0 <= nr < BOARD_SIZE and 0 <= nc < BOARD_SIZE:
-                    if board_state[self.index(nr, nc)] == player:
-                        neg_count += 1
-                    elif board_state[self.index(nr, nc)] == Cell.EMPTY:
-                        open_ends += 1
-                        break
-                    else:
-                        break
-                else:
-                    break
-            
-            count = pos_count + neg_count
-            
-            if count >= 4:
-                return 10000
-            elif count == 3:
-                if open_ends == 2:
-                    max_threat = max(max_threat, 5000)
-                elif open_ends == 1:
-                    max_threat = max(max_threat, 1000)
-            elif count == 2:
-                if open_ends == 2:
-                    max_threat = max(max_threat, 500)
-                elif open_ends == 1:
-                    max_threat = max(max_threat, 100)
-        
-        return max_threat
-    
     def check_board_full(self):
         return all(cell != Cell.EMPTY for cell in self.board)
     
-    def generate_candidate_moves(self, board_state):
-        moves = []
-        
-        has_pieces = any(cell != Cell.EMPTY for cell in board_state)
-        
-        if not has_pieces:
-            center = BOARD_SIZE // 2
-            random_row = center + random.randint(-2, 2)
-            random_col = center + random.randint(-2, 2)
-            random_row = max(2, min(BOARD_SIZE - 3, random_row))
-            random_col = max(2, min(BOARD_SIZE - 3, random_col))
-            moves.append((random_row, random_col))
-            return moves
-        
-        considered = [[False] * BOARD_SIZE for _ in range(BOARD_SIZE)]
-        
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if board_state[self.index(r, c)] != Cell.EMPTY:
-                    for dr in range(-2, 3):
-                        for dc in range(-2, 3):
-                            nr, nc = r + dr, c + dc
-                            if (0 <= nr < BOARD_SIZE and 0 <= nc < BOARD_SIZE and
-                                not considered[nr][nc] and 
-                                board_state[self.index(nr, nc)] == Cell.EMPTY):
-                                considered[nr][nc] = True
-                                moves.append((nr, nc))
-        
-        center = BOARD_SIZE // 2
-        if board_state[self.index(center, center)] == Cell.EMPTY:
-            moves.insert(0, (center, center))
-        
-        return moves
-    
-    def evaluate_board(self, board_state, ai_player):
-        opponent = Cell.BLACK if ai_player == Cell.WHITE else Cell.WHITE
-        score = 0
+    def computer_move(self):
+        if self.is_game_over or self.is_thinking or self.state != GameState.PLAYING:
+            return
         
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if board_state[self.index(r, c)] != Cell.EMPTY:
-                    continue
-                
-                directions = [(0, 1), (1, 0), (1, 1), (1, -1)]
-                
-                for dr, dc in directions:
-                    ai_count = 0
-                    opponent_count = 0
-                    
-                    for i in range(1, 5):
-                        nr, nc = r + i * dr, c + i * dc
-                        if 0 <= nr < BOARD_SIZE and 0 <= nc < BOARD_SIZE:
-                            cell = board_state[self.index(nr, nc)]
-                            if cell == ai_player:
-                                ai_count += 1
-                            elif cell == opponent:
-                                opponent_count += 1
-                                break
-                            else:
-                                break
-                        else:
-                            break
-                    
-                    for i in range(1, 5):
-                        nr, nc = r - i * dr, c - i * dc
-                        if 0 <= nr < BOARD_SIZE and 0 <= nc < BOARD_SIZE:
-                            cell = board_state[self.index(nr, nc)]
-                            if cell == ai_player:
-                                ai_count += 1
-                            elif cell == opponent:
-                                opponent_count += 1
-                                break
-                            else:
-                                break
-                        else:
-                            break
-                    
-                    if opponent_count == 0:
-                        if ai_count >= 4:
-                            score += 50000
-                        elif ai_count == 3:
-                            score += 5000
-                        elif ai_count == 2:
-                            score += 500
-                        elif ai_count == 1:
-                            score += 50
-                    
-                    if ai_count == 0:
-                        if opponent_count >= 4:
-                            score -= 50000
-                        elif opponent_count == 3:
-                            score -= 5000
-                        elif opponent_count == 2:
-                            score -= 500
-                        elif opponent_count == 1:
-                            score -= 50
-                
-                if abs(score) > 100000:
-                    return score
+        if self.search_thread is not None:
+            self.search_thread.join()
+        self.stop_pondering()
+        
+        pondered = self.ai.ponder_results.get(self.last_move)
+        self.ai.ponder_results = {}
+        if pondered is not None:
+            self.apply_computer_move(pondered)
+            return
         
-        return score
+        self.search_generation += 1
+        self.search_result = None
+        self.is_thinking = True
+        self.ai.reset_cancel()
+        self.search_thread = threading.Thread(target=self.think,
+                                              args=(self.board[:], self.computer_color, self.search_generation),
+                                              daemon=True)
+        self.search_thread.start()
+        self.turtle_screen.ontimer(self.poll_computer_move, 50)
     
-    def minimax(self, board_state, depth, alpha, beta, is_maximizing, ai_player):
-        board_hash = self.transposition_table.compute_hash(board_state)
-        
-        if depth < AI_SEARCH_DEPTH - 2:
-            cached = self.transposition_table.get(board_hash)
-            if cached is not None and cached[1] >= depth:
-                return cached[0]
-        
-        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
-        
-        if self.check_win(board_state, ai_player):
-            return 1000000 - depth
-        if self.check_win(board_state, opponent):
-            return -1000000 + depth
-        if depth == 0 or all(cell != Cell.EMPTY for cell in board_state):
-            eval_score = self.evaluate_board(board_state, ai_player)
-            if depth < AI_SEARCH_DEPTH - 2:
-                self.transposition_table.set(board_hash, eval_score, depth)
-            return eval_score
-        
-        possible_moves = self.generate_candidate_moves(board_state)
-        self.sort_moves_by_priority(possible_moves, board_state, ai_player)
-        
-        max_moves = 20 if depth > 2 else 25
-        if len(possible_moves) > max_moves:
-            possible_moves = possible_moves[:max_moves]
-        
-        if is_maximizing:
-            max_eval = float('-inf')
-            for move in possible_moves:
-                board_state[self.index(move[0], move[1])] = ai_player
-                eval_score = self.minimax(board_state, depth - 1, alpha, beta, False, ai_player)
-                board_state[self.index(move[0], move[1])] = Cell.EMPTY
-                
-                max_eval = max(max_eval, eval_score)
-                alpha = max(alpha, eval_score)
-                if beta <= alpha:
-                    break
-            
-            if depth < AI_SEARCH_DEPTH - 2:
-                self.transposition_table.set(board_hash, max_eval, depth)
-            return max_eval
-        else:
-            min_eval = float('inf')
-            for move in possible_moves:
-                board_state[self.index(move[0], move[1])] = opponent
-                eval_score = self.minimax(board_state, depth - 1, alpha, beta, True, ai_player)
-                board_state[self.index(move[0], move[1])] = Cell.EMPTY
-                
-                min_eval = min(min_eval, eval_score)
-                beta = min(beta, eval_score)
-                if beta <= alpha:
-                    break
-            
-            if depth < AI_SEARCH_DEPTH - 2:
-                self.transposition_table.set(board_hash, min_eval, depth)
-            return min_eval
+    def think(self, board_state, ai_player, generation):
+        best_move = self.ai.get_best_move(board_state, ai_player, AI_TIME_LIMIT, AI_NODE_LIMIT)
+        self.search_result = (generation, best_move)
     
-    def sort_moves_by_priority(self, moves, board_state, ai_player):
-        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
+    def poll_computer_move(self):
+        if not self.is_thinking:
+            return
         
-        def get_priority(move):
-            priority = 0
-            r, c = move[0], move[1]
-            
-            board_state[self.index(r, c)] = ai_player
-            if self.check_win_fast(board_state, ai_player, r, c):
-                priority += 100000
-            board_state[self.index(r, c)] = Cell.EMPTY
-            
-            board_state[self.index(r, c)] = opponent
-            if self.check_win_fast(board_state, opponent, r, c):
-                priority += 90000
-            board_state[self.index(r, c)] = Cell.EMPTY
-            
-            ai_threat = self.count_threat_level(board_state, ai_player, r, c)
-            priority += ai_threat
-            
-            opponent_threat = self.count_threat_level(board_state, opponent, r, c)
-            priority += opponent_threat * 1.5
-            
-            center_dist = abs(r - BOARD_SIZE//2) + abs(c - BOARD_SIZE//2)
-            priority += (BOARD_SIZE - center_dist) * 5
-            
-            return priority
+        result = self.search_result
+        if result is None:
+            self.draw_thinking()
+            self.turtle_screen.ontimer(self.poll_computer_move, 50)
+            return
         
-        moves.sort(key=get_priority, reverse=True)
+        self.is_thinking = False
+        self.thinking_turtle.clear()
+        generation, best_move = result
+        if generation != self.search_generation or self.state != GameState.PLAYING:
+            return
+        self.apply_computer_move(best_move)
     
-    def get_best_move(self, board_state, ai_player):
-        best_move = (-1, -1)
-        best_score = float('-inf')
-        opponent = Cell.WHITE if ai_player == Cell.BLACK else Cell.BLACK
-        
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if board_state[self.index(r, c)] == Cell.EMPTY:
-                    board_state[self.index(r, c)] = ai_player
-                    if self.check_win_fast(board_state, ai_player, r, c):
-                        best_move = (r, c)
-                        board_state[self.index(r, c)] = Cell.EMPTY
-                        return best_move
-                    board_state[self.index(r, c)] = Cell.EMPTY
-        
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if board_state[self.index(r, c)] == Cell.EMPTY:
-                    board_state[self.index(r, c)] = opponent
-                    if self.check_win_fast(board_state, opponent, r, c):
-                        best_move = (r, c)
-                        board_state[self.index(r, c)] = Cell.EMPTY
-                        return best_move
-                    board_state[self.index(r, c)] = Cell.EMPTY
-        
-        max_threat = 0
-        threat_move = (-1, -1)
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if board_state[self.index(r, c)] == Cell.EMPTY:
-                    threat_level = self.count_threat_level(board_state, opponent, r, c)
-                    if threat_level > max_threat:
-                        max_threat = threat_level
-                        threat_move = (r, c)
-        
-        if max_threat >= 5000:
-            return threat_move
-        
-        possible_moves = self.generate_candidate_moves(board_state)
-        self.sort_moves_by_priority(possible_moves, board_state, ai_player)
-        
-        if len(possible_moves) > 15:
-            possible_moves = possible_moves[:15]
-        
-        alpha = float('-inf')
-        beta = float('inf')
-        
-        for move in possible_moves:
-            board_state[self.index(move[0], move[1])] = ai_player
-            score = self.minimax(board_state, AI_SEARCH_DEPTH - 3, alpha, beta, False, ai_player)
-            board_state[self.index(move[0], move[1])] = Cell.EMPTY
-            
-            if score >= best_score:
-                best_score = score
-                best_move = move
+    def cancel_thinking(self):
+        if not self.is_thinking:
+            return
         
-        print(f"AI selected move: {best_move} with score {best_score}")
-        return best_move
+        self.search_generation += 1
+        self.is_thinking = False
+        self.ai.cancel()
+        if self.search_thread is not None:
+            self.search_thread.join()
+        self.thinking_turtle.clear()
     
-    def computer_move(self):
-        if self.is_game_over:
+    def start_pondering(self):
+        if not AI_PONDER or self.is_game_over or self.ponder_thread is not None:
+            return
+        
+        self.ai.reset_cancel()
+        self.ponder_thread = threading.Thread(target=self.ai.ponder,
+                                              args=(self.board[:], self.computer_color,
+                                                    AI_TIME_LIMIT, AI_NODE_LIMIT),
+                                              daemon=True)
+        self.ponder_thread.start()
+    
+    def stop_pondering(self):
+        if self.ponder_thread is None:
             return
         
-        best_move = self.get_best_move(self.board, self.computer_color)
+        self.ai.cancel()
+        self.ponder_thread.join()
+        self.ponder_thread = None
+    
+    def apply_computer_move(self, best_move):
         if best_move[0] != -1:
             self.board[self.index(best_move[0], best_move[1])] = self.computer_color
             self.last_move = best_move
             
-            if self.check_win_fast(self.board, self.computer_color, best_move[0], best_move[1]):
+            if self.ai.check_win_fast(self.board, self.computer_color, best_move[0], best_move[1]):
                 self.winner = self.computer_color
                 self.is_game_over = True
                 self.state = GameState.GAME_OVER
@@ -619,26 +251,28 @@ class GomokuGame:
         
         self.is_human_turn = True
         self.draw()
+        self.start_pondering()
     
     def handle_escape(self):
         if self.state == GameState.MENU:
             self.turtle_screen.bye()
         elif self.state == GameState.PLAYING:
+            self.cancel_thinking()
             self.state = GameState.PAUSED
             self.draw()
         elif self.state == GameState.PAUSED:
             self.state = GameState.PLAYING
             self.draw()
+            if not self.is_human_turn and not self.is_game_over:
+                self.turtle_screen.ontimer(self.computer_move, 100)
         elif self.state == GameState.GAME_OVER:
-            reset_scores()
+            self.reset_scores()
             self.reset_board()
             self.score_updated = False
             self.state = GameState.MENU
             self.draw()
     
     def handle_click(self, x, y):
-        global human_wins, computer_wins, current_round
-        
         if self.state == GameState.MENU:
             if self.start_button.contains(x, y):
                 self.state = GameState.COIN_SELECT
@@ -675,10 +309,11 @@ class GomokuGame:
             if r != -1 and c != -1:
                 idx = self.index(r, c)
                 if self.board[idx] == Cell.EMPTY:
+                    self.stop_pondering()
                     self.board[idx] = self.human_color
                     self.last_move = (r, c)
                     
-                    if self.check_win_fast(self.board, self.human_color, r, c):
+                    if self.ai.check_win_fast(self.board, self.human_color, r, c):
                         self.winner = self.human_color
                         self.is_game_over = True
                         self.state = GameState.GAME_OVER
@@ -708,13 +343,12 @@ class GomokuGame:
                     self.state = GameState.PLAYING
                     self.draw()
             elif self.main_menu_button.contains(x, y):
+                self.cancel_thinking()
                 self.state = GameState.MENU
-                reset_scores()
+                self.reset_scores()
                 self.draw()
     
     def draw(self):
-        global human_wins, computer_wins, current_round
-        
         self.turtle_pen.clear()
         
         if self.state == GameState.MENU:
@@ -727,13 +361,13 @@ class GomokuGame:
                 self.draw_paused_overlay()
         elif self.state == GameState.GAME_OVER:
             if not self.score_updated:
-                current_round += 1
+                self.current_round += 1
                 if self.winner == self.human_color:
-                    human_wins += 1
+                    self.human_wins += 1
                 elif self.winner == self.computer_color:
-                    computer_wins += 1
+                    self.computer_wins += 1
                 self.score_updated = True
-                print(f"Game Over - Round: {current_round - 1}, Human Wins: {human_wins}, Computer Wins: {computer_wins}")
+                print(f"Game Over - Round: {self.current_round - 1}, Human Wins: {self.human_wins}, Computer Wins: {self.computer_wins}")
             self.draw_game_over()
         
         self.turtle_screen.update()
@@ -770,7 +404,7 @@ class GomokuGame:
         self.turtle_pen.fillcolor(BOARD_COLOR)
         self.turtle_pen.pensize(2)
         self.turtle_pen.begin_fill()
-        board_width = self.cell_size * BOARD_SIZE
+        board_width = self.cell_size * self.size
         for _ in range(2):
             self.turtle_pen.forward(board_width)
             self.turtle_pen.left(90)
@@ -780,21 +414,21 @@ class GomokuGame:
         
         self.turtle_pen.pensize(1)
         self.turtle_pen.color("black")
-        for i in range(BOARD_SIZE):
+        for i in range(self.size):
             self.turtle_pen.penup()
             self.turtle_pen.goto(self.board_x, self.board_y + i * self.cell_size)
             self.turtle_pen.pendown()
-            self.turtle_pen.goto(self.board_x + (BOARD_SIZE - 1) * self.cell_size, 
+            self.turtle_pen.goto(self.board_x + (self.size - 1) * self.cell_size, 
                                  self.board_y + i * self.cell_size)
             
             self.turtle_pen.penup()
             self.turtle_pen.goto(self.board_x + i * self.cell_size, self.board_y)
             self.turtle_pen.pendown()
             self.turtle_pen.goto(self.board_x + i * self.cell_size, 
-                                 self.board_y + (BOARD_SIZE - 1) * self.cell_size)
+                                 self.board_y + (self.size - 1) * self.cell_size)
         
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
+        for r in range(self.size):
+            for c in range(self.size):
                 v = self.board[self.index(r, c)]
                 if v == Cell.EMPTY:
                     continue
@@ -819,7 +453,7 @@ class GomokuGame:
                 self.turtle_pen.end_fill()
         
         left_x = -WINDOW_WIDTH/2 + 50
-        start_y = self.board_y + self.cell_size * (BOARD_SIZE - 1) / 2
+        start_y = self.board_y + self.cell_size * (self.size - 1) / 2
         
         self.turtle_pen.penup()
         self.turtle_pen.goto(left_x, start_y + 40)
@@ -830,17 +464,17 @@ class GomokuGame:
         self.turtle_pen.penup()
         self.turtle_pen.goto(left_x, start_y)
         self.turtle_pen.color(GOLD_COLOR)
-        self.turtle_pen.write(f"Round: {current_round}", align="left", font=("Google Sans Flex", 12, "normal"))
+        self.turtle_pen.write(f"Round: {self.current_round}", align="left", font=("Google Sans Flex", 12, "normal"))
         
         self.turtle_pen.penup()
         self.turtle_pen.goto(left_x, start_y - 40)
         self.turtle_pen.color(GREEN_COLOR)
-        self.turtle_pen.write(f"Your Wins: {human_wins}", align="left", font=("Google Sans Flex", 12, "normal"))
+        self.turtle_pen.write(f"Your Wins: {self.human_wins}", align="left", font=("Google Sans Flex", 12, "normal"))
         
         self.turtle_pen.penup()
         self.turtle_pen.goto(left_x, start_y - 80)
         self.turtle_pen.color(RED_COLOR)
-        self.turtle_pen.write(f"AI Wins: {computer_wins}", align="left", font=("Google Sans Flex", 12, "normal"))
+        self.turtle_pen.write(f"AI Wins: {self.computer_wins}", align="left", font=("Google Sans Flex", 12, "normal"))
         
         if not self.is_human_turn and not self.is_game_over:
             self.turtle_pen.penup()
@@ -848,6 +482,23 @@ class GomokuGame:
             self.turtle_pen.color(BLACK_COLOR)
             self.turtle_pen.write("Computer's Turn...", align="center", font=("Google Sans Flex", 20, "bold"))
     
+    def draw_thinking(self):
+        self.thinking_angle = (self.thinking_angle + 30) % 360
+        radius = 10
+        
+        self.thinking_turtle.clear()
+        self.thinking_turtle.penup()
+        self.thinking_turtle.goto(150, WINDOW_HEIGHT/2 - 38)
+        self.thinking_turtle.setheading(self.thinking_angle)
+        self.thinking_turtle.forward(radius)
+        self.thinking_turtle.left(90)
+        self.thinking_turtle.color(GOLD_COLOR)
+        self.thinking_turtle.pensize(3)
+        self.thinking_turtle.pendown()
+        self.thinking_turtle.circle(radius, 270)
+        self.thinking_turtle.penup()
+        self.turtle_screen.update()
+    
     def draw_paused_overlay(self):
         self.turtle_pen.penup()
         self.turtle_pen.goto(0, WINDOW_HEIGHT/2 - 60)
@@ -886,8 +537,11 @@ class GomokuGame:
     
     def run(self):
         self.turtle_screen.mainloop()
+        self.ai.cancel()
+        self.ai.shutdown()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     game = GomokuGame()
     game.run()
@@ -0,0 +1,105 @@
+import os
+from array import array
+
+# Threat classes of playing a stone on an empty cell, judged along one line.
+NONE, ONE, TWO, OPEN_TWO, THREE, OPEN_THREE, FOUR, OPEN_FOUR, FIVE = range(9)
+CLASS_NAMES = ("none", "one", "two", "open two", "three", "open three", "four", "open four", "five")
+
+# Digits of a segment code, seen from the player being scored. Off-board
+# cells are padded as BLOCKED, exactly like an opposing stone.
+EMPTY, OWN, BLOCKED = 0, 1, 2
+
+# One more stone turns a shape into the next class up.
+PROMOTIONS = {OPEN_FOUR: OPEN_THREE, FOUR: THREE, OPEN_THREE: OPEN_TWO, THREE: TWO}
+
+tables = {}
+
+
+def segment_length(win_length):
+    return 2 * win_length - 1
+
+
+def shape(cells, centre, win_length, memo):
+    # Class of a segment whose centre already holds an own stone.
+    if cells in memo:
+        return memo[cells]
+
+    windows = [range(start, start + win_length) for start in range(centre + 1)]
+    completions = set()
+    for window in windows:
+        if any(cells[i] == BLOCKED for i in window):
+            continue
+        empties = [i for i in window if cells[i] == EMPTY]
+        if not empties:
+            memo[cells] = FIVE
+            return FIVE
+        if len(empties) == 1:
+            completions.add(empties[0])
+
+    if completions:
+        # Two cells that each complete a five cannot both be blocked, which
+        # covers straight fours as well as split shapes like X_XXX_X.
+        result = OPEN_FOUR if len(completions) >= 2 else FOUR
+    else:
+        result = NONE
+        for i, cell in enumerate(cells):
+            if cell != EMPTY:
+                continue
+            child = shape(cells[:i] + (OWN,) + cells[i + 1:], centre, win_length, memo)
+            result = max(result, PROMOTIONS.get(child, NONE))
+        if result == NONE and any(all(cells[i] != BLOCKED for i in window) for window in windows):
+            result = ONE
+
+    memo[cells] = result
+    return result
+
+
+def build_table(win_length):
+    n = segment_length(win_length)
+    centre = win_length - 1
+    memo = {}
+    table = array('B', [NONE]) * (3 ** n)
+    for code in range(3 ** n):
+        digits = []
+        rest = code
+        for _ in range(n):
+            rest, digit = divmod(rest, 3)
+            digits.append(digit)
+        if digits[centre] != EMPTY:
+            continue
+        digits[centre] = OWN
+        table[code] = shape(tuple(digits), centre, win_length, memo)
+    return table
+
+
+def pattern_table(win_length, cache_dir=None):
+    # table[code] is the class of playing the centre of a segment, where
+    # digit k of the base-3 code describes the cell k - (win_length - 1)
+    # steps along the line. Tables are cached per process and, when
+    # cache_dir is given, on disk.
+    if win_length in tables:
+        return tables[win_length]
+
+    size = 3 ** segment_length(win_length)
+    path = None
+    table = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"patterns_{win_length}.bin")
+        try:
+            with open(path, "rb") as f:
+                table = array('B')
+                table.fromfile(f, size)
+        except (OSError, EOFError):
+            table = None
+
+    if table is None:
+        table = build_table(win_length)
+        if path is not None:
+            try:
+                with open(path, "wb") as f:
+                    table.tofile(f)
+            except OSError:
+                pass
+
+    tables[win_length] = table
+    return table
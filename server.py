@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from geometry import get_geometry
+from engine import BOARD_SIZE, WINNING_LENGTH, Cell, GomokuAI
+
+logger = logging.getLogger("gomoku.server")
+
+COLOURS = {Cell.WHITE: "white", Cell.BLACK: "black"}
+
+# Geometry tables are built on the event loop and the pattern table grows as
+# 3 ** (2 * win_length - 1), so a single request must not ask for much more
+# than the common board shapes.
+MAX_SIZE = 19
+MAX_WIN_LENGTH = 6
+MAX_SECONDS = 600
+
+worker_engines = {}
+
+
+def search_move(board, player, size, win_length, time_limit, node_limit, cancel_event):
+    # Runs in a pool process. Engines are kept per board shape and shared by
+    # the sessions that land on this worker; the transposition table is keyed
+    # by position, so their entries never conflict.
+    key = (size, win_length)
+    if key not in worker_engines:
+        ai = GomokuAI(workers=1, geometry=get_geometry(size, win_length))
+        if ai.position_cache is not None:
+            ai.position_cache.close()
+            ai.position_cache = None
+        worker_engines[key] = ai
+    ai = worker_engines[key]
+    ai.cancel_event = cancel_event
+    move = ai.get_best_move(board, player, time_limit, node_limit)
+    return move, ai.last_score, ai.nodes
+
+
+class RequestError(Exception):
+    pass
+
+
+def request_number(request, key, default, integer=False, limit=None):
+    value = request.get(key, default)
+    if value is None and default is None:
+        return None
+    valid = isinstance(value, int) if integer else isinstance(value, (int, float))
+    if (not valid or isinstance(value, bool) or value != value or value <= 0
+            or limit is not None and value > limit):
+        bound = f" up to {limit}" if limit is not None else ""
+        raise RequestError(f"{key} must be a positive {'integer' if integer else 'number'}{bound}")
+    return value
+
+
+class Session:
+    def __init__(self, game_id, geometry):
+        self.id = game_id
+        self.geometry = geometry
+        self.board = [Cell.EMPTY] * geometry.cells
+        self.to_move = Cell.WHITE
+        self.winner = None
+        self.search = None
+        self.cancel_event = None
+    
+    def state(self):
+        return {
+            "game": self.id,
+            "to_move": COLOURS[self.to_move],
+            "winner": self.winner,
+            "stones": self.geometry.cells - self.board.count(Cell.EMPTY),
+        }
+    
+    def play(self, r, c):
+        if self.winner is not None:
+            raise RequestError("game is over")
+        if not self.geometry.in_bounds(r, c):
+            raise RequestError(f"move {[r, c]} is off the board")
+        idx = self.geometry.index(r, c)
+        if self.board[idx] != Cell.EMPTY:
+            raise RequestError(f"cell {[r, c]} is taken")
+        
+        player = self.to_move
+        self.board[idx] = player
+        if self.wins(idx, player):
+            self.winner = COLOURS[player]
+        elif Cell.EMPTY not in self.board:
+            self.winner = "draw"
+        self.to_move = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+    
+    def wins(self, idx, player):
+        for forward, backward in self.geometry.rays[idx]:
+            count = 1
+            for ray in (forward, backward):
+                for n in ray:
+                    if self.board[n] != player:
+                        break
+                    count += 1
+            if count >= self.geometry.win_length:
+                return True
+        return False
+
+
+class EngineServer:
+    def __init__(self, workers, max_queue, default_time):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.default_time = default_time
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        # Manager events can be handed to pool processes, which lets a
+        # cancel reach a search that is already running.
+        self.manager = multiprocessing.Manager()
+        self.slots = None
+        self.queued = 0
+        self.game_ids = itertools.count(1)
+    
+    async def start(self, host=None, port=None, unix_path=None):
+        self.slots = asyncio.Semaphore(self.workers)
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+    
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
+    
+    async def handle_connection(self, reader, writer):
+        sessions = {}
+        tasks = set()
+        write_lock = asyncio.Lock()
+        
+        async def send(message):
+            async with write_lock:
+                writer.write((json.dumps(message) + "\n").encode())
+                await writer.drain()
+        
+        def finished(task, request, session):
+            tasks.discard(task)
+            if not task.cancelled():
+                return
+            # Cancelled before its first step, so reply() never ran to
+            # free the session or answer the request.
+            if session is not None and session.search is task:
+                session.search = None
+                session.cancel_event = None
+            if not writer.is_closing():
+                late = asyncio.create_task(self.respond(send, {"id": request.get("id"), "cancelled": True}))
+                tasks.add(late)
+                late.add_done_callback(tasks.discard)
+        
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("requests are JSON objects")
+                except ValueError as e:
+                    await send({"error": f"bad request: {e}"})
+                    continue
+                
+                if request.get("op") == "request_move":
+                    # Searches run as tasks so this connection keeps reading,
+                    # which is what lets a later cancel through. The session
+                    # is marked busy before the task first runs, so a cancel,
+                    # play or close_game read right after this sees the search.
+                    session = sessions.get(request.get("game"))
+                    task = asyncio.create_task(self.reply(send, request, sessions))
+                    if session is not None and session.search is None:
+                        session.search = task
+                        session.cancel_event = self.manager.Event()
+                    tasks.add(task)
+                    task.add_done_callback(
+                        lambda task, request=request, session=session: finished(task, request, session))
+                else:
+                    await self.reply(send, request, sessions)
+        except ConnectionError:
+            pass
+        finally:
+            for session in sessions.values():
+                self.cancel(session)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+    
+    async def reply(self, send, request, sessions):
+        response = {"id": request.get("id")}
+        try:
+            response.update(await self.dispatch(request, sessions))
+        except RequestError as e:
+            response["error"] = str(e)
+        except asyncio.CancelledError:
+            response["cancelled"] = True
+        except Exception:
+            # Anything else is a server bug, but the client still gets a reply.
+            logger.exception("request %r failed", request)
+            response["error"] = "internal error"
+        await self.respond(send, response)
+    
+    async def respond(self, send, response):
+        try:
+            await send(response)
+        except ConnectionError:
+            pass
+    
+    async def dispatch(self, request, sessions):
+        op = request.get("op")
+        if op == "new_game":
+            size = request_number(request, "size", BOARD_SIZE, integer=True, limit=MAX_SIZE)
+            win_length = request_number(request, "win_length", WINNING_LENGTH, integer=True,
+                                        limit=MAX_WIN_LENGTH)
+            try:
+                geometry = get_geometry(size, win_length)
+            except ValueError as e:
+                raise RequestError(str(e))
+            session = Session(next(self.game_ids), geometry)
+            sessions[session.id] = session
+            return session.state()
+        
+        session = sessions.get(request.get("game"))
+        if session is None:
+            raise RequestError("unknown game")
+        
+        if op == "play":
+            if session.search is not None:
+                raise RequestError("a search is running for this game")
+            move = request.get("move")
+            # bool is an int subclass, so true/false would pass as 1/0.
+            if not (isinstance(move, list) and len(move) == 2
+                    and all(isinstance(v, int) and not isinstance(v, bool) for v in move)):
+                raise RequestError("move must be [row, col]")
+            session.play(*move)
+            return session.state()
+        if op == "request_move":
+            return await self.request_move(session, request)
+        if op == "cancel":
+            return {"cancelled": self.cancel(session)}
+        if op == "state":
+            return session.state()
+        if op == "close_game":
+            self.cancel(session)
+            del sessions[session.id]
+            return {"game": session.id, "closed": True}
+        raise RequestError(f"unknown op {op!r}")
+    
+    async def request_move(self, session, request):
+        # handle_connection hands the session to this task before it runs;
+        # any other task finding it busy is a second request for the game.
+        if session.search is not asyncio.current_task():
+            raise RequestError("a search is already running for this game")
+        try:
+            if session.winner is not None:
+                raise RequestError("game is over")
+            if self.queued >= self.max_queue:
+                raise RequestError("server busy, retry later")
+            
+            time_limit = request_number(request, "time", self.default_time, limit=MAX_SECONDS)
+            # The deadline covers queueing as well as searching; by default a
+            # request may wait one extra search budget for a free worker.
+            deadline = request_number(request, "deadline", 2 * time_limit + 1, limit=3 * MAX_SECONDS)
+            node_limit = request_number(request, "nodes", None, integer=True)
+            loop = asyncio.get_running_loop()
+            deadline += loop.time()
+            
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                raise RequestError("deadline passed while waiting for a worker")
+            finally:
+                self.queued -= 1
+            
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                self.slots.release()
+                raise RequestError("deadline passed while waiting for a worker")
+            search = loop.run_in_executor(self.executor, search_move, session.board[:],
+                                          session.to_move, session.geometry.size,
+                                          session.geometry.win_length, min(time_limit, remaining),
+                                          node_limit, session.cancel_event)
+            # The slot is held until the worker is really free, even when the
+            # request gives up on it first.
+            search.add_done_callback(lambda _: self.slots.release())
+            try:
+                move, score, nodes = await asyncio.wait_for(asyncio.shield(search), remaining + 1)
+            except asyncio.TimeoutError:
+                session.cancel_event.set()
+                raise RequestError("search missed its deadline")
+            except asyncio.CancelledError:
+                session.cancel_event.set()
+                raise
+        finally:
+            session.search = None
+            session.cancel_event = None
+        
+        move = list(move)
+        if request.get("apply", True):
+            session.play(*move)
+        response = session.state()
+        response.update({"move": move, "score": score, "nodes": nodes})
+        return response
+    
+    def cancel(self, session):
+        if session.search is None:
+            return False
+        if session.cancel_event is not None:
+            session.cancel_event.set()
+        session.search.cancel()
+        return True
+
+
+async def serve(args):
+    server = EngineServer(args.workers, args.max_queue, args.time)
+    try:
+        listener = await server.start(args.host, args.port, args.unix)
+        where = args.unix or f"{args.host}:{args.port}"
+        logger.info("serving on %s with %d workers", where, args.workers)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the Gomoku engine over JSON lines.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="search processes shared by all sessions")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="searches allowed to wait for a worker before requests are refused")
+    parser.add_argument("--time", type=float, default=1.0,
+                        help="default search budget per move in seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
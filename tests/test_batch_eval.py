@@ -0,0 +1,39 @@
+import pytest
+
+from bench import CORPUS, parse_board
+from engine import Cell, GomokuAI, load_numpy
+
+pytestmark = pytest.mark.skipif(load_numpy() is None, reason="numpy is not installed")
+
+
+def engine_for(board):
+    ai = GomokuAI(workers=1)
+    ai.opening_book = None
+    ai.position_cache = None
+    ai.load_search_state(board)
+    return ai
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_batch_leaves_match_scalar_leaves(name):
+    player, rows = CORPUS[name]
+    replier = Cell.WHITE if player == Cell.BLACK else Cell.BLACK
+    for ai_player in (player, replier):
+        sign = 1 if player == ai_player else -1
+        board = parse_board(rows)
+        
+        batch = engine_for(board)
+        moves = batch.frontier_moves(board)
+        batch_scores = [sign * score
+                        for score in batch.batch_leaf_scores(board, moves, player, ai_player)]
+        
+        scalar = engine_for(board)
+        for move, batch_score in zip(moves, batch_scores):
+            scalar.make_move(board, move[0], move[1], player)
+            score = -scalar.pvs(board, 0, float('-inf'), float('inf'), replier, ai_player)
+            stored = scalar.transposition_table.get(scalar.tt_key()[0])
+            scalar.unmake_move(board, move[0], move[1], player)
+            assert batch_score == score, move
+            
+            key = batch.tt_key_after(move[0], move[1], player)
+            assert batch.transposition_table.get(key) == stored, move
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+from server import EngineServer
+
+
+async def with_server(talk):
+    server = EngineServer(workers=1, max_queue=4, default_time=0.5)
+    try:
+        listener = await server.start("127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        
+        async def send(**request):
+            writer.write((json.dumps(request) + "\n").encode())
+            await writer.drain()
+        
+        async def receive():
+            return json.loads(await asyncio.wait_for(reader.readline(), 10))
+        
+        try:
+            return await talk(send, receive)
+        finally:
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+    finally:
+        server.close()
+
+
+def run(talk):
+    return asyncio.run(with_server(talk))
+
+
+async def replies(receive, count):
+    received = {}
+    for _ in range(count):
+        reply = await receive()
+        received[reply["id"]] = reply
+    return received
+
+
+def test_cancel_right_after_request_move():
+    async def talk(send, receive):
+        await send(id=1, op="new_game", size=10, win_length=5)
+        game = (await receive())["game"]
+        await send(id=2, op="request_move", game=game, time=5)
+        await send(id=3, op="cancel", game=game)
+        await send(id=4, op="state", game=game)
+        return await replies(receive, 3)
+    
+    received = run(talk)
+    assert received[3] == {"id": 3, "cancelled": True}
+    assert received[2]["cancelled"] is True
+    assert received[4]["stones"] == 0
+
+
+def test_play_is_refused_while_a_move_is_pending():
+    async def talk(send, receive):
+        await send(id=1, op="new_game", size=10, win_length=5)
+        game = (await receive())["game"]
+        await send(id=2, op="request_move", game=game, time=0.2)
+        await send(id=3, op="play", game=game, move=[0, 0])
+        return await replies(receive, 2)
+    
+    received = run(talk)
+    assert received[3]["error"] == "a search is running for this game"
+    assert received[2]["stones"] == 1
+    assert received[2]["to_move"] == "black"
+
+
+def test_second_request_move_is_refused():
+    async def talk(send, receive):
+        await send(id=1, op="new_game", size=10, win_length=5)
+        game = (await receive())["game"]
+        await send(id=2, op="request_move", game=game, time=0.2)
+        await send(id=3, op="request_move", game=game, time=0.2)
+        return await replies(receive, 2)
+    
+    received = run(talk)
+    assert received[3]["error"] == "a search is already running for this game"
+    assert received[2]["stones"] == 1
+
+
+def test_bad_requests_get_errors():
+    async def talk(send, receive):
+        await send(id=1, op="new_game", size=10, win_length=5)
+        game = (await receive())["game"]
+        received = {}
+        for request in ({"id": 2, "op": "play", "game": game, "move": [True, 0]},
+                        {"id": 3, "op": "request_move", "game": game, "time": True},
+                        {"id": 4, "op": "request_move", "game": game, "nodes": -5},
+                        {"id": 5, "op": "new_game", "size": 40},
+                        {"id": 6, "op": "state", "game": game}):
+            await send(**request)
+            received[request["id"]] = await receive()
+        return received
+    
+    received = run(talk)
+    assert received[2]["error"] == "move must be [row, col]"
+    assert "time" in received[3]["error"]
+    assert "nodes" in received[4]["error"]
+    assert "size" in received[5]["error"]
+    assert received[6]["stones"] == 0
@@ -0,0 +1,74 @@
+from engine import Cell, OpeningBook, PositionCache, TTFlag
+from geometry import get_geometry
+
+
+def test_opening_book_round_trip(tmp_path):
+    geometry = get_geometry(10, 5)
+    path = str(tmp_path / "book.bin")
+    book = OpeningBook(geometry, path=path)
+    assert book.lookup([Cell.EMPTY] * geometry.cells, Cell.WHITE) is None
+    
+    board = [Cell.EMPTY] * geometry.cells
+    board[geometry.index(4, 4)] = Cell.WHITE
+    board[geometry.index(4, 5)] = Cell.BLACK
+    key, t = book.canonical(board, Cell.WHITE)
+    book.write(path, {key: (book.maps[t][geometry.index(3, 4)], 120)})
+    
+    book = OpeningBook(geometry, path=path)
+    assert book.count == 1
+    assert book.lookup(board, Cell.WHITE) == ((3, 4), 120)
+    # The same position with the other side to move is a different entry.
+    assert book.lookup(board, Cell.BLACK) is None
+    
+    # A mirror image of the position finds the mirrored move.
+    mirrored = [Cell.EMPTY] * geometry.cells
+    mirrored[geometry.index(4, 5)] = Cell.WHITE
+    mirrored[geometry.index(4, 4)] = Cell.BLACK
+    assert book.lookup(mirrored, Cell.WHITE) == ((3, 5), 120)
+    book.close()
+    
+    # A book for another board size is ignored.
+    assert OpeningBook(get_geometry(15, 5), path=path).count == 0
+
+
+def test_position_cache_round_trip(tmp_path):
+    geometry = get_geometry(10, 5)
+    cache = PositionCache(geometry, directory=str(tmp_path), size_mb=0.01)
+    cache.record(12345, Cell.WHITE, 777, 6, TTFlag.EXACT, 44)
+    cache.record(12345, Cell.WHITE, 555, 3, TTFlag.LOWER, 45)
+    assert cache.get(12345, Cell.WHITE) is None
+    cache.close()
+    
+    cache = PositionCache(geometry, directory=str(tmp_path), size_mb=0.01)
+    assert cache.generation == 2
+    # The deeper of the two results is the one kept.
+    assert cache.get(12345, Cell.WHITE) == (777, 6, TTFlag.EXACT, 44)
+    assert cache.get(12345, Cell.BLACK) is None
+    
+    # A shallower result never replaces a deeper one already on disk.
+    cache.record(12345, Cell.WHITE, 1, 2, TTFlag.UPPER, 7)
+    cache.flush()
+    assert cache.get(12345, Cell.WHITE) == (777, 6, TTFlag.EXACT, 44)
+    cache.close()
+    
+    # A different size cap starts the file over.
+    cache = PositionCache(geometry, directory=str(tmp_path), size_mb=0.02)
+    assert cache.get(12345, Cell.WHITE) is None
+    cache.close()
+
+
+def test_position_cache_evicts_old_shallow_entries(tmp_path):
+    geometry = get_geometry(10, 5)
+    cache = PositionCache(geometry, directory=str(tmp_path), size_mb=0.001)
+    buckets = cache.num_buckets
+    keys = [5 + i * buckets for i in range(PositionCache.BUCKET_SIZE + 1)]
+    for depth, key in enumerate(keys[:-1], 3):
+        cache.record(key, Cell.EMPTY, depth, depth, TTFlag.EXACT, 0)
+    cache.flush()
+    cache.record(keys[-1], Cell.EMPTY, 9, 9, TTFlag.EXACT, 0)
+    cache.close()
+    
+    cache = PositionCache(geometry, directory=str(tmp_path), size_mb=0.001)
+    assert cache.get(keys[0], Cell.EMPTY) is None
+    assert [cache.get(key, Cell.EMPTY)[1] for key in keys[1:]] == [4, 5, 6, 9]
+    cache.close()
@@ -0,0 +1,91 @@
+from bench import CORPUS, parse_board
+from engine import WIN_SCORE, Cell, GomokuAI
+from patterns import OPEN_THREE
+
+# Black to move must block white's open three on row 5.
+BLOCKS = [(5, 2), (5, 6)]
+
+
+def tactical_engine():
+    ai = GomokuAI(workers=1)
+    ai.opening_book = None
+    ai.position_cache = None
+    player, rows = CORPUS["tactical"]
+    board = parse_board(rows)
+    return ai, board, player
+
+
+def test_defences_are_dropped_when_the_budget_runs_out():
+    ai, board, _ = tactical_engine()
+    ai.load_search_state(board)
+    ai.threat_solver.start(100)
+    assert ai.threat_solver.defences(Cell.WHITE) is None
+
+
+def test_defences_with_a_full_budget():
+    ai, board, _ = tactical_engine()
+    ai.load_search_state(board)
+    ai.threat_solver.start(50000)
+    assert sorted(ai.threat_solver.defences(Cell.WHITE)) == BLOCKS
+
+
+def test_open_three_is_blocked_at_every_depth():
+    for depth in (None, 2, 3, 4):
+        ai, board, player = tactical_engine()
+        assert ai.get_best_move(board, player, max_depth=depth) in BLOCKS
+
+
+def board_with(black, white):
+    ai = GomokuAI(workers=1)
+    ai.opening_book = None
+    ai.position_cache = None
+    board = [Cell.EMPTY] * ai.geometry.cells
+    for player, cells in ((Cell.BLACK, black), (Cell.WHITE, white)):
+        for r, c in cells:
+            board[ai.index(r, c)] = player
+    return ai, board
+
+
+def test_threat_moves_report_win_scores():
+    open_four = [(4, 3), (4, 4), (4, 5), (4, 6)]
+    ai, board = board_with(open_four, [(0, 0), (0, 1), (0, 2), (9, 9)])
+    assert ai.get_best_move(board, Cell.BLACK) in [(4, 2), (4, 7)]
+    assert (ai.last_score, ai.last_source) == (WIN_SCORE - 1, "threat")
+    # White can only block one end of the open four.
+    assert ai.get_best_move(board, Cell.WHITE) in [(4, 2), (4, 7)]
+    assert (ai.last_score, ai.last_source) == (-(WIN_SCORE - 2), "threat")
+    
+    # (4, 5) makes two fours at once: a win in three plies.
+    ai, board = board_with([(4, 2), (4, 3), (4, 4), (1, 5), (2, 5), (3, 5)],
+                           [(4, 1), (0, 5), (9, 9), (9, 8), (9, 7), (8, 9)])
+    assert ai.get_best_move(board, Cell.BLACK) == (4, 5)
+    assert (ai.last_score, ai.last_source) == (WIN_SCORE - 3, "threat")
+
+
+def test_move_threats_match_the_bitboard_scans():
+    for name in sorted(CORPUS):
+        ai = GomokuAI(workers=1)
+        player, rows = CORPUS[name]
+        board = parse_board(rows)
+        ai.load_search_state(board)
+        solver = ai.threat_solver
+        width = ai.bitboard.width
+        opponent = Cell.WHITE if player == Cell.BLACK else Cell.BLACK
+        for move in ai.frontier_moves(board):
+            ai.make_move(board, move[0], move[1], player)
+            moves = ai.frontier_moves(board)
+            
+            def cells(mask):
+                return {m for m in moves if mask >> (m[0] * width + m[1]) & 1}
+            
+            for side, other in ((player, opponent), (opponent, player)):
+                assert ai.evaluator.has_five(side) == bool(solver.five_cells(side))
+                wins, blocks, fours, threes = ai.move_threats(moves, side)
+                assert wins == cells(solver.five_cells(side))
+                assert blocks == cells(solver.five_cells(other))
+                assert fours == cells(solver.four_cells(side) | solver.four_cells(other)) | wins | blocks
+                # Both ways select the same moves: fours, plus open threes.
+                open_threes = {m for m in cells(solver.three_cells(side))
+                               if ai.evaluator.threat_class(m[0] * ai.size + m[1], side) >= OPEN_THREE}
+                assert threes | fours == open_threes | fours
+            ai.unmake_move(board, move[0], move[1], player)
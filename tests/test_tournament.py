@@ -0,0 +1,65 @@
+import argparse
+import math
+
+import pytest
+
+from tournament import Match, parse_config, to_elo, to_score
+
+
+def match(wins, draws, losses, elo0=0, elo1=10, alpha=0.05, beta=0.05):
+    m = Match(elo0, elo1, alpha, beta)
+    for result, count in ((1.0, wins), (0.5, draws), (0.0, losses)):
+        for _ in range(count):
+            m.add(result)
+    return m
+
+
+def test_elo_and_score_are_inverse():
+    for elo in (-400, -50, 0, 35, 200):
+        assert to_elo(to_score(elo)) == pytest.approx(elo)
+    assert to_score(0) == 0.5
+    assert to_elo(0.75) == pytest.approx(400 * math.log10(3))
+
+
+def test_elo_interval():
+    m = match(60, 20, 20)
+    elo, low, high = m.elo()
+    # 70% is 147 Elo; the interval comes from the per-game score variance.
+    assert elo == pytest.approx(to_elo(0.7))
+    assert low < elo < high
+    margin = 1.96 * math.sqrt((60 * 0.3 ** 2 + 20 * 0.2 ** 2 + 20 * 0.7 ** 2) / 100 / 100)
+    assert low == pytest.approx(to_elo(0.7 - margin))
+    assert high == pytest.approx(to_elo(0.7 + margin))
+    assert match(0, 0, 0).elo() == (0.0, 0.0, 0.0)
+
+
+def test_llr_and_decision():
+    even = match(50, 0, 50)
+    assert even.llr() < 0
+    strong = match(700, 100, 200)
+    s0, s1 = to_score(0), to_score(10)
+    mean, var = strong.score_stats()
+    assert strong.llr() == pytest.approx(1000 * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var))
+    assert strong.decision() == "H1"
+    assert match(200, 100, 700).decision() == "H0"
+    assert match(1, 0, 1).decision() is None
+    # Every game drawn has no variance, so it proves nothing either way.
+    assert match(0, 10, 0).llr() == 0.0
+
+
+def test_sprt_bounds():
+    m = Match(0, 10, 0.05, 0.05)
+    assert m.upper == pytest.approx(math.log(19))
+    assert m.lower == pytest.approx(-math.log(19))
+
+
+def test_parse_config():
+    config = parse_config("time=0.2, depth=4,use_symmetry=False,THREAT_SCORES=(0,10,50)")
+    assert config == {"time": 0.2, "depth": 4, "use_symmetry": False, "THREAT_SCORES": (0, 10, 50)}
+    assert parse_config("") == {}
+
+
+@pytest.mark.parametrize("text", ["time", "BOARD_SIZE=15", "AI_WORKERS=2", "NO_SUCH_CONSTANT=1"])
+def test_parse_config_rejects(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_config(text)
@@ -0,0 +1,297 @@
+import argparse
+import ast
+import contextlib
+import math
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import engine
+from geometry import get_geometry
+from engine import BOARD_SIZE, WINNING_LENGTH, Cell, GomokuAI
+
+SEARCH_KEYS = ("time", "nodes", "depth")
+# Constants that fix the board or the process layout, which the match
+# itself decides.
+FIXED_CONSTANTS = {
+    "BOARD_SIZE": "use --size",
+    "WINNING_LENGTH": "use --win-length",
+    "AI_WORKERS": "games already run one per process",
+}
+
+engine_cache = {}
+
+
+def parse_config(text):
+    # "time=0.2,depth=4,use_symmetry=False,THREAT_SCORES=(0,10,50,200,300,2000,2500,15000,50000)"
+    config = {}
+    if not text:
+        return config
+    for item in split_items(text):
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if not name or not value:
+            raise argparse.ArgumentTypeError(f"expected name=value, got {item!r}")
+        if name in FIXED_CONSTANTS:
+            raise argparse.ArgumentTypeError(f"{name} cannot be overridden, {FIXED_CONSTANTS[name]}")
+        if name.isupper() and not hasattr(engine, name):
+            raise argparse.ArgumentTypeError(f"engine.py has no constant {name!r}")
+        config[name] = ast.literal_eval(value.strip())
+    return config
+
+
+def split_items(text):
+    # Commas inside brackets belong to tuple values, not to the item list.
+    items, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            items.append(text[start:i])
+            start = i + 1
+    items.append(text[start:])
+    return [item for item in items if item.strip()]
+
+
+class Engine:
+    def __init__(self, config, geometry):
+        self.search = {key: config[key] for key in SEARCH_KEYS if key in config}
+        self.constants = {k: v for k, v in config.items() if k not in SEARCH_KEYS and k.isupper()}
+        self.attributes = {k: v for k, v in config.items() if k not in SEARCH_KEYS and not k.isupper()}
+        # Settings such as USE_BITBOARD or TT_SIZE_MB are read when the
+        # engine is built, so the overrides are in place for that too.
+        with self.overrides():
+            self.ai = GomokuAI(workers=1, geometry=geometry)
+        # Games run in parallel processes, which must not share one cache file.
+        if self.ai.position_cache is not None:
+            self.ai.position_cache.close()
+            self.ai.position_cache = None
+        for name, value in self.attributes.items():
+            if not hasattr(self.ai, name):
+                raise AttributeError(f"GomokuAI has no setting {name!r}")
+            setattr(self.ai, name, value)
+    
+    def new_game(self):
+        self.ai.reset()
+    
+    @contextlib.contextmanager
+    def overrides(self):
+        # Module constants are shared by both engines in a worker, so each
+        # engine swaps its own values in only while it is built or searching.
+        saved = {name: getattr(engine, name) for name in self.constants}
+        for name, value in self.constants.items():
+            setattr(engine, name, value)
+        try:
+            yield
+        finally:
+            for name, value in saved.items():
+                setattr(engine, name, value)
+    
+    def best_move(self, board, player):
+        with self.overrides():
+            return self.ai.get_best_move(board[:], player,
+                                         time_limit=self.search.get("time"),
+                                         node_limit=self.search.get("nodes"),
+                                         max_depth=self.search.get("depth"))
+
+
+def get_engine(config, geometry):
+    key = (geometry.size, geometry.win_length, repr(sorted(config.items())))
+    if key not in engine_cache:
+        engine_cache[key] = Engine(config, geometry)
+    return engine_cache[key]
+
+
+def random_opening(rng, plies, size):
+    # Stones go near the centre so openings stay playable for both sides.
+    center = size // 2
+    cells = [(r, c) for r in range(center - 2, center + 3) for c in range(center - 2, center + 3)]
+    return rng.sample(cells, plies)
+
+
+def play_game(config_a, config_b, opening, a_first, size, win_length):
+    # White moves first; the opening stones alternate starting with white.
+    geometry = get_geometry(size, win_length)
+    engines = {Cell.WHITE: get_engine(config_a if a_first else config_b, geometry),
+               Cell.BLACK: get_engine(config_b if a_first else config_a, geometry)}
+    for player_engine in engines.values():
+        player_engine.new_game()
+    
+    board = [Cell.EMPTY] * (size * size)
+    player = Cell.WHITE
+    for r, c in opening:
+        board[r * size + c] = player
+        player = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+    
+    referee = engines[Cell.WHITE].ai
+    moves = len(opening)
+    while Cell.EMPTY in board:
+        r, c = engines[player].best_move(board, player)
+        if not (0 <= r < size and 0 <= c < size) or board[r * size + c] != Cell.EMPTY:
+            winner = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+            break
+        board[r * size + c] = player
+        moves += 1
+        if referee.check_win_fast(board, player, r, c):
+            winner = player
+            break
+        player = Cell.BLACK if player == Cell.WHITE else Cell.WHITE
+    else:
+        winner = None
+    
+    if winner is None:
+        result = 0.5
+    else:
+        a_colour = Cell.WHITE if a_first else Cell.BLACK
+        result = 1.0 if winner == a_colour else 0.0
+    return result, moves
+
+
+class Match:
+    def __init__(self, elo0, elo1, alpha, beta):
+        self.wins = self.draws = self.losses = 0
+        self.elo0, self.elo1 = elo0, elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+    
+    def add(self, result):
+        if result == 1.0:
+            self.wins += 1
+        elif result == 0.0:
+            self.losses += 1
+        else:
+            self.draws += 1
+    
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+    
+    def score_stats(self):
+        n = self.games
+        mean = (self.wins + 0.5 * self.draws) / n
+        var = (self.wins * (1 - mean) ** 2 + self.draws * (0.5 - mean) ** 2
+               + self.losses * mean ** 2) / n
+        return mean, var
+    
+    def elo(self):
+        # Elo difference of A over B with a 95% confidence interval.
+        if not self.games:
+            return 0.0, 0.0, 0.0
+        mean, var = self.score_stats()
+        margin = 1.96 * math.sqrt(var / self.games)
+        return to_elo(mean), to_elo(mean - margin), to_elo(mean + margin)
+    
+    def llr(self):
+        # Normal approximation of the SPRT log-likelihood ratio for
+        # H1: elo = elo1 against H0: elo = elo0.
+        if not self.games:
+            return 0.0
+        mean, var = self.score_stats()
+        if var == 0:
+            return 0.0
+        s0, s1 = to_score(self.elo0), to_score(self.elo1)
+        return self.games * (s1 - s0) * (2 * mean - s0 - s1) / (2 * var)
+    
+    def decision(self):
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+    
+    def summary(self):
+        elo, low, high = self.elo()
+        return (f"W-D-L {self.wins}-{self.draws}-{self.losses}  "
+                f"Elo {elo:+.1f} [{low:+.1f}, {high:+.1f}]  "
+                f"LLR {self.llr():.2f} ({self.lower:.2f}, {self.upper:.2f})")
+
+
+def to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def to_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def run(config_a, config_b, games, concurrency, opening_plies, seed, sprt,
+        size=BOARD_SIZE, win_length=WINNING_LENGTH):
+    rng = random.Random(seed)
+    match = Match(*sprt)
+    
+    # Each opening is played twice with the colours swapped.
+    pending = []
+    for i in range(0, games, 2):
+        opening = random_opening(rng, opening_plies, size)
+        pending.append((i, opening, True))
+        if i + 1 < games:
+            pending.append((i + 1, opening, False))
+    pending.reverse()
+    
+    with ProcessPoolExecutor(max_workers=concurrency) as executor:
+        running = {}
+        decision = None
+        while pending or running:
+            while pending and len(running) < concurrency and decision is None:
+                index, opening, a_first = pending.pop()
+                future = executor.submit(play_game, config_a, config_b, opening, a_first,
+                                         size, win_length)
+                running[future] = (index, a_first)
+            if not running:
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, a_first = running.pop(future)
+                result, moves = future.result()
+                match.add(result)
+                outcome = {1.0: "A wins", 0.0: "B wins", 0.5: "draw"}[result]
+                colour = "white" if a_first else "black"
+                print(f"game {index + 1}: A as {colour}, {outcome} in {moves} moves  {match.summary()}",
+                      flush=True)
+            
+            if decision is None:
+                decision = match.decision()
+                if decision is not None:
+                    pending.clear()
+    
+    print(f"finished {match.games} games: {match.summary()}")
+    if decision == "H1":
+        print(f"SPRT accepted H1: A is at least {sprt[1]:+g} Elo stronger")
+    elif decision == "H0":
+        print(f"SPRT accepted H0: A is not {sprt[1]:+g} Elo stronger")
+    return match
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Play engine configurations A and B against each other headless.",
+        epilog="Configs are comma separated name=value pairs: time, nodes and depth "
+               "set the search budget, upper-case names override engine.py constants "
+               "and lower-case names set GomokuAI attributes.")
+    parser.add_argument("--a", type=parse_config, default={}, metavar="CONFIG",
+                        help="configuration of engine A, e.g. time=0.2,depth=5")
+    parser.add_argument("--b", type=parse_config, default={}, metavar="CONFIG",
+                        help="configuration of engine B")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=BOARD_SIZE)
+    parser.add_argument("--win-length", type=int, default=WINNING_LENGTH)
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--opening-plies", type=int, default=2,
+                        help="random stones placed near the centre before the engines play")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=10.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+    
+    for config in (args.a, args.b):
+        if not any(key in config for key in SEARCH_KEYS):
+            config["time"] = 0.1
+    run(args.a, args.b, args.games, args.concurrency, args.opening_plies, args.seed,
+        (args.elo0, args.elo1, args.alpha, args.beta), args.size, args.win_length)